@@ -0,0 +1,409 @@
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+import pandas as pd
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import Qt
+from merry import PandasModel, EditOverlay, CSVReaderApp, SortDialog, DescribeDialog, StatsWorker, SaveWorker
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+KINDS = ["int", "float", "cat", "text", "date"]
+
+class IlocModel(PandasModel):
+    # What PandasModel.data did before the block renderer
+    def data(self, index, role=Qt.DisplayRole):
+        if index.isValid():
+            if role == Qt.DisplayRole:
+                if index.column() == 0:
+                    return str(index.row() + 1)
+                else:
+                    return str(self._data.iloc[index.row(), index.column() - 1])
+        return None
+
+def make_frame(rows, cols, seed=0, mix=("int", "float", "cat")):
+    # Columns cycle through the kinds in mix: int, float, cat (a few repeated
+    # words), text (mostly distinct strings) and date
+    rng = np.random.default_rng(seed)
+    data = {}
+    for col in range(cols):
+        kind = mix[col % len(mix)]
+        if kind == "int":
+            data[f"int_{col}"] = rng.integers(0, 1000000, rows)
+        elif kind == "float":
+            data[f"float_{col}"] = rng.random(rows) * 1000
+        elif kind == "cat":
+            data[f"cat_{col}"] = rng.choice(["alpha", "beta", "gamma", "delta"], rows)
+        elif kind == "text":
+            data[f"text_{col}"] = np.char.add("id-", rng.integers(0, 1 << 40, rows).astype(str))
+        elif kind == "date":
+            data[f"date_{col}"] = (np.datetime64("2000-01-01") + rng.integers(0, 9000, rows)).astype(str)
+        else:
+            raise ValueError(f"Unknown column kind {kind!r}; use {', '.join(KINDS)}")
+    return pd.DataFrame(data)
+
+def make_csv(file_path, rows, cols, seed=0, mix=("int", "float", "cat"), chunk_rows=1000000):
+    # Written a slice at a time so 1e7-row files do not need the whole frame in memory
+    with open(file_path, "w", newline="") as handle:
+        for number, start in enumerate(range(0, rows, chunk_rows)):
+            frame = make_frame(min(chunk_rows, rows - start), cols, seed + number, mix)
+            frame.to_csv(handle, index=False, header=number == 0)
+    return file_path
+
+def scroll_positions(rows, viewport_rows, steps, seed=0):
+    # Mix of small wheel scrolls and long jumps, like a user dragging the scrollbar
+    rng = np.random.default_rng(seed)
+    top = 0
+    positions = []
+    for _ in range(steps):
+        if rng.random() < 0.8:
+            top += int(rng.integers(1, 4)) * 3
+        else:
+            top = int(rng.integers(0, rows))
+        top = max(0, min(top, rows - viewport_rows))
+        positions.append(top)
+    return positions
+
+def pump(app, done, timeout=600):
+    # Runs the event loop until done(), for work that reports back through signals
+    deadline = time.perf_counter() + timeout
+    while not done():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("Benchmark step did not finish in time.")
+        app.processEvents()
+        time.sleep(0.001)
+
+# Runs LoadDataWorker in a fresh interpreter so peak RSS is not inflated by
+# whatever the benchmark itself has allocated. Prints one JSON line.
+LOAD_CHILD = """
+import json, sys, time
+import pandas, numpy
+from merry import LoadDataWorker, concat_frames
+try:
+    import resource
+except ImportError:
+    resource = None
+
+def peak_mb():
+    # VmHWM where there is /proc: ru_maxrss survives exec on Linux and would
+    # report the benchmark's own peak
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+file_path, mode = sys.argv[1], sys.argv[2]
+baseline = peak_mb()
+worker = LoadDataWorker(file_path, stream=mode == "stream", cache=None, compact=mode == "compact")
+chunks, loaded, first, errors = [], [], [], []
+start = time.perf_counter()
+
+def chunk_loaded(chunk):
+    if not first:
+        first.append(time.perf_counter() - start)
+    chunks.append(chunk)
+
+worker.signals.chunk_loaded.connect(chunk_loaded)
+worker.signals.data_loaded.connect(loaded.append)
+worker.signals.error.connect(errors.append)
+worker.run()
+if errors:
+    sys.exit(errors[0])
+data = concat_frames(chunks) if chunks else loaded[0]
+elapsed = time.perf_counter() - start
+peak = peak_mb()
+print(json.dumps({"seconds": elapsed, "first_rows_seconds": first[0] if first else elapsed, "rows": len(data),
+                  "peak_rss_mb": peak, "rss_growth_mb": None if peak is None else peak - baseline,
+                  "memory_usage_mb": data.memory_usage(deep=True).sum() / 1024 ** 2}))
+"""
+
+def bench_load(file_path, modes=("whole", "stream", "compact")):
+    results = {}
+    for mode in modes:
+        result = subprocess.run([sys.executable, "-c", LOAD_CHILD, file_path, mode], cwd=HERE,
+                                capture_output=True, text=True, check=True)
+        results[mode] = json.loads(result.stdout.strip().splitlines()[-1])
+    return results
+
+def bench_data_calls(frame, viewport_rows=40, steps=300, baseline=True):
+    rows, columns = frame.shape[0], frame.shape[1] + 1
+    positions = scroll_positions(rows, viewport_rows, steps)
+    models = [("block_renderer", PandasModel(frame))]
+    if baseline:
+        models.insert(0, ("iloc", IlocModel(frame)))
+    results = {}
+    for name, model in models:
+        calls = 0
+        start = time.perf_counter()
+        for top in positions:
+            for row in range(top, min(top + viewport_rows, rows)):
+                for col in range(1, columns):
+                    model.data(model.index(row, col))
+                    calls += 1
+        elapsed = time.perf_counter() - start
+        results[name] = {"calls_per_second": calls / elapsed, "seconds": elapsed}
+    return results
+
+def bench_sort(app, window, frame):
+    # Through SortDialog.sort_data, timed until the sorted order is on screen
+    results = {}
+    for name, keys in (("one_key", [(0, True)]), ("two_keys", [(2 % frame.shape[1], True), (0, False)])):
+        model = PandasModel(frame)
+        window.data = frame
+        window.show_model(model)
+        dialog = SortDialog(window, frame, keys)
+        start = time.perf_counter()
+        dialog.sort_data()
+        pump(app, lambda: model.sort_keys == keys)
+        results[name] = {"seconds": time.perf_counter() - start}
+    return results
+
+def bench_filter(app, window, frame):
+    # Through the filter bar, one apply_filter per keystroke as if typing,
+    # timed until that keystroke's matches are on screen
+    results = {}
+    queries = {
+        "contains": (None, "contains", ["a", "al", "alp", "alph", "alpha"]),
+        "equals": (min(2, frame.shape[1] - 1), "equals", ["beta"]),
+        "between": (0, "between", ["1000..500000"]),
+    }
+    for name, (col, operator, texts) in queries.items():
+        window.data = frame
+        window.show_model(PandasModel(frame))
+        window.filter_column_combo.setCurrentIndex(0 if col is None else col + 1)
+        window.filter_operator_combo.setCurrentText(operator)
+        times = []
+        for text in texts:
+            window.filter_input.setText(text)
+            window.filter_timer.stop()  # Timed directly rather than through the debounce
+            start = time.perf_counter()
+            window.apply_filter()
+            pump(app, lambda: not window.filter_busy)
+            times.append(time.perf_counter() - start)
+        results[name] = {"first_seconds": times[0], "total_seconds": sum(times),
+                         "matched_rows": window.table_view.model().rowCount()}
+    return results
+
+def bench_describe(window, frame):
+    # What describe_data does before showing the dialog: compute every column, then format the table
+    window.data = frame
+    model = PandasModel(frame)
+    window.show_model(model)
+    start = time.perf_counter()
+    stats = model.column_stats()
+    worker = StatsWorker(stats)
+    worker.signals.stats_ready.connect(window.stats_ready)
+    worker.run()
+    computed = time.perf_counter() - start
+    DescribeDialog(window, stats)
+    return {"seconds": time.perf_counter() - start, "compute_seconds": computed}
+
+def bench_save(frame, directory):
+    # SaveWorker is what save_file starts once a file name is picked; to_csv is the old path
+    rows = frame.shape[0]
+    results = {}
+    for name, file_name in (("to_csv", "save.csv"), ("save_worker", "save.csv"), ("save_worker_gz", "save.csv.gz")):
+        path = os.path.join(directory, file_name)
+        start = time.perf_counter()
+        if name == "to_csv":
+            frame.to_csv(path, index=False)
+        else:
+            SaveWorker(path, frame, None, EditOverlay(), 0).run()
+        elapsed = time.perf_counter() - start
+        results[name] = {"seconds": elapsed, "rows_per_second": rows / elapsed,
+                         "mb_per_second": os.path.getsize(path) / elapsed / 1024 ** 2}
+        os.remove(path)
+    return results
+
+# Runs in a fresh interpreter and prints the wall-clock time of the first
+# paint of the main window, so interpreter start and imports are counted
+FIRST_PAINT = """
+import os, sys, time
+from PySide6.QtWidgets import QApplication
+from PySide6.QtCore import QObject, QEvent
+from merry import CSVReaderApp
+
+class FirstPaint(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Paint:
+            print(time.time(), "pandas" in sys.modules, flush=True)
+            os._exit(0)
+        return False
+
+app = QApplication(sys.argv)
+first_paint = FirstPaint()
+app.installEventFilter(first_paint)
+window = CSVReaderApp()
+window.show()
+app.exec()
+"""
+
+def import_times():
+    # Cumulative milliseconds for `import merry` and each module it imports
+    # directly. -X importtime lists children before their parent, indented
+    # two spaces per level.
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import merry"],
+                            cwd=HERE, capture_output=True, text=True, check=True)
+    children = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        if level == 1:
+            children[name.strip()] = int(cumulative) / 1000
+        elif level == 0:
+            if name.strip() == "merry":
+                return {"merry (total)": int(cumulative) / 1000, **children}
+            children = {}
+    return {}
+
+def bench_startup(runs=5):
+    paints = []
+    for _ in range(runs):
+        start = time.time()
+        result = subprocess.run([sys.executable, "-c", FIRST_PAINT], cwd=HERE,
+                                capture_output=True, text=True, check=True)
+        painted, pandas_loaded = result.stdout.split()
+        paints.append((float(painted) - start) * 1000)
+    return {"first_paint_ms": sorted(paints)[len(paints) // 2],
+            "pandas_before_paint": pandas_loaded == "True",
+            "imports_ms": import_times()}
+
+def environment():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "pandas": pd.__version__,
+            "numpy": np.__version__, "platform": platform.platform(), "cpus": os.cpu_count()}
+
+def run_suite(sizes, cols, mix, seed, skip=()):
+    app = QApplication.instance() or QApplication(sys.argv)
+    report = {"environment": environment(),
+              "config": {"rows": sizes, "cols": cols, "mix": list(mix), "seed": seed}, "results": []}
+    if "startup" not in skip:
+        startup = bench_startup()
+        report["results"].append({"bench": "startup", **startup})
+        status = "ok" if startup["first_paint_ms"] < 300 else "over the 300 ms target"
+        print(f"{'first paint':>22}: {startup['first_paint_ms']:8.0f} ms ({status})")
+    window = CSVReaderApp()
+    with tempfile.TemporaryDirectory() as directory:
+        for rows in sizes:
+            file_path = make_csv(os.path.join(directory, f"bench_{rows}.csv"), rows, cols, seed, mix)
+            entry = {"rows": rows, "file_mb": os.path.getsize(file_path) / 1024 ** 2}
+            if "load" not in skip:
+                entry["load"] = bench_load(file_path)
+            frame = pd.read_csv(file_path)
+            if "scroll" not in skip:
+                # The iloc baseline only where it finishes in reasonable time
+                entry["scroll"] = bench_data_calls(frame, baseline=rows <= 1000000)
+            if "sort" not in skip:
+                entry["sort"] = bench_sort(app, window, frame)
+            if "filter" not in skip:
+                entry["filter"] = bench_filter(app, window, frame)
+            if "describe" not in skip:
+                entry["describe"] = bench_describe(window, frame)
+            if "save" not in skip:
+                entry["save"] = bench_save(frame, directory)
+            os.remove(file_path)
+            report["results"].append({"bench": "suite", **entry})
+            print_entry(entry)
+    window.jobs.shutdown()
+    return report
+
+def print_entry(entry):
+    print(f"--- {entry['rows']:,} rows ({entry['file_mb']:.1f} MB)")
+    for mode, result in entry.get("load", {}).items():
+        rss = "" if result["peak_rss_mb"] is None else f", peak RSS {result['peak_rss_mb']:.0f} MB"
+        print(f"{'load ' + mode:>22}: {result['seconds']:8.3f} s (first rows {result['first_rows_seconds']:.3f} s{rss})")
+    for name, result in entry.get("scroll", {}).items():
+        print(f"{'scroll ' + name:>22}: {result['calls_per_second']:12,.0f} data() calls/sec")
+    for name, result in entry.get("sort", {}).items():
+        print(f"{'sort ' + name:>22}: {result['seconds']:8.3f} s")
+    for name, result in entry.get("filter", {}).items():
+        print(f"{'filter ' + name:>22}: {result['first_seconds']:8.3f} s first, {result['total_seconds']:.3f} s total")
+    if "describe" in entry:
+        print(f"{'describe':>22}: {entry['describe']['seconds']:8.3f} s")
+    for name, result in entry.get("save", {}).items():
+        print(f"{'save ' + name:>22}: {result['seconds']:8.3f} s {result['mb_per_second']:8.1f} MB/sec written")
+
+def flatten(report):
+    # {"rows=100000 sort two_keys seconds": 0.12, ...} for every number in a report
+    values = {}
+    def walk(prefix, value):
+        if isinstance(value, dict):
+            for key, item in value.items():
+                walk(f"{prefix} {key}", item)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[prefix] = value
+    for result in report["results"]:
+        if result["bench"] == "startup":
+            walk("startup", {"first_paint_ms": result["first_paint_ms"]})
+        else:
+            walk(f"rows={result['rows']}", {key: item for key, item in result.items()
+                                             if key not in ("bench", "rows", "file_mb")})
+    return values
+
+def compare(old_path, new_path, threshold=0.1):
+    # Lower is better for times and memory, higher for rates. Returns how many
+    # measurements got worse by more than threshold.
+    with open(old_path) as handle:
+        old = flatten(json.load(handle))
+    with open(new_path) as handle:
+        new = flatten(json.load(handle))
+    regressions = 0
+    for name in sorted(old.keys() & new.keys()):
+        if not old[name] or name.endswith("rows"):
+            continue
+        change = new[name] / old[name] - 1
+        if name.endswith("per_second"):
+            change = -change
+        worse = change > threshold
+        regressions += worse
+        print(f"{'REGRESSED' if worse else '':>9} {name}: {old[name]:.4g} -> {new[name]:.4g} ({change:+.0%})")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless benchmarks for Merry CSV Reader.")
+    parser.add_argument("--rows", default="10000,100000,1000000",
+                        help="comma-separated row counts, e.g. 1e4,1e7")
+    parser.add_argument("--cols", type=int, default=12)
+    parser.add_argument("--mix", default="int,float,cat", help=f"column kinds to cycle through: {','.join(KINDS)}")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--skip", default="",
+                        help="comma-separated benchmarks to skip: startup,load,scroll,sort,filter,describe,save")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two result files; exits non-zero on regressions")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative slowdown counted as a regression")
+    args = parser.parse_args()
+
+    if args.compare:
+        sys.exit(1 if compare(*args.compare, args.threshold) else 0)
+    sizes = [int(float(rows)) for rows in args.rows.split(",")]
+    mix = [kind.strip() for kind in args.mix.split(",")]
+    skip = [name.strip() for name in args.skip.split(",") if name.strip()]
+    report = run_suite(sizes, args.cols, mix, args.seed, skip)
+    if args.output:
+        with open(args.output, "w") as handle:
+            json.dump(report, handle, indent=2)
+
+if __name__ == "__main__":
+    main()
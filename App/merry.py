@@ -1,124 +1,734 @@
-import pandas as pd
-import numpy as np
 import sys
+import os
 from PySide6.QtWidgets import (
     QApplication, QMainWindow, QFileDialog, QMessageBox, QTableView, QHeaderView,
     QHBoxLayout,QVBoxLayout, QWidget, QProgressBar, QPushButton, QLabel, QStatusBar, QSplitter,
-    QMenuBar, QMenu, QDialog, QDialogButtonBox, QTextEdit, QComboBox, QAbstractItemView,QLineEdit
+    QMenuBar, QMenu, QDialog, QDialogButtonBox, QTextEdit, QComboBox, QAbstractItemView,QLineEdit,
+    QListWidget, QCheckBox
 )
-from PySide6.QtGui import QIcon, QAction
-from PySide6.QtCore import Signal, Qt, QAbstractTableModel, QObject, QRunnable, QThreadPool
-import asyncio
-import multiprocessing
-import io
+from PySide6.QtGui import QIcon, QAction, QKeySequence
+from PySide6.QtCore import (Signal, Qt, QAbstractTableModel, QModelIndex, QObject, QRunnable, QThreadPool, QTimer,
+                            QFileSystemWatcher, QEvent)
+import csv
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+# The data side of the viewer lives in merry_core, which imports no Qt so the
+# same load, sort, stats and save code runs in batch jobs
+from merry_core import (
+    LazyModule, BlockRenderer, concat_frames, memory_report, MappedCSV, FileReset, TailReader, SidecarCache, EditOverlay,
+    sort_permutation, JobCancelled, SaveCancelled, tracer, JobToken, iter_chunks, write_csv, FilterEngine,
+    ColumnStats, CSVLoader, GroupAggregator, AGGREGATIONS, CSVDiff, COMMANDS, main as cli_main
+)
+
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+
+OPEN_FILTER = "CSV Files (*.csv *.tsv *.tab *.txt *.gz *.bz2 *.xz *.zst);;All Files (*)"
 
 class PandasModel(QAbstractTableModel):
-    def __init__(self, data):
+    def __init__(self, data, quoted=False):
         super(PandasModel, self).__init__()
         self._data = data
+        self.edits = EditOverlay()
+        self._renderer = data if isinstance(data, MappedCSV) else BlockRenderer(data, edits=self.edits)
+        self._renderer.quoted = quoted
+        self._pending = []  # Chunks received from a streaming load but not yet shown
+        self.eager_rows = 10000
+        self._order = None
+        self.sort_keys = None
+        self._orders = OrderedDict()  # Recent sort keys -> permutation
+        self.max_orders = 8
+        self._filter = None  # Data rows that pass the filter bar, None for all
+        self._view = None  # Sort order with filtered-out rows removed
+        self._positions = None  # Data row -> view row, built on first use
+        self._filters = None
+        self._filter_edits = set()  # Columns edited since the filter engine was taken
+        self._stats = None
+
+    def append_chunk(self, chunk):
+        self._pending.append(chunk)
+        # Fill the first screens straight away; after that the view pulls rows
+        # in through fetchMore as the user scrolls towards the end.
+        if self._data.shape[0] < self.eager_rows:
+            self.fetchMore()
+
+    def extend(self, data):
+        # Rows appended to the file while it is being followed. The follow job
+        # has already joined them onto the frame, so here it is only swapped in.
+        first = self._data.shape[0]
+        count = data.shape[0] - first
+        if count <= 0:
+            return
+        shown = self.rowCount()
+        self.beginInsertRows(QModelIndex(), shown, shown + count - 1)
+        self._data = data
+        self._rows_added(first, count, shown)
+        self.endInsertRows()
+
+    def canFetchMore(self, parent=None):
+        return bool(self._pending)
+
+    def fetchMore(self, parent=None):
+        if not self._pending:
+            return
+        first = self._data.shape[0]
+        count = sum(len(chunk) for chunk in self._pending)
+        shown = self.rowCount()
+        if count:
+            # New rows always land at the end of the view
+            self.beginInsertRows(QModelIndex(), shown, shown + count - 1)
+        with tracer.span("append rows", rows=count):
+            self._data = concat_frames([self._data] + self._pending)
+        self._pending = []
+        self._rows_added(first, count, shown)
+        if count:
+            self.endInsertRows()
+
+    def _rows_added(self, first, count, shown):
+        # shown is the number of view rows before the new ones
+        if self._order is not None:
+            # New rows go after the sorted ones until the next sort
+            self._order = np.concatenate([self._order, np.arange(first, first + count, dtype=self._order.dtype)])
+        if self._filter is not None:
+            # and are shown until the filter is applied again
+            self._filter = np.concatenate([self._filter, np.arange(first, first + count, dtype=self._filter.dtype)])
+        # Cached orders for other keys would leave the new rows out of place.
+        # Filter indexes and stats take the new rows in as they go.
+        self._orders.clear()
+        if self._filters is not None:
+            self._filters = self._filters.extended(self._data)
+        if self._stats is not None:
+            self._stats.extend(self._data)
+        self._update_view(shown)
+
+    def set_quoted(self, quoted):
+        # Quotes are added when cells are formatted; the data itself is untouched
+        self._renderer.quoted = quoted
+        self._renderer.invalidate()
+        if self.rowCount():
+            self.dataChanged.emit(self.index(0, 1), self.index(self.rowCount() - 1, self.columnCount() - 1))
+
+    def frame(self):
+        self.fetchMore()
+        return self._data
+
+    def snapshot(self, filtered=False):
+        # Data, row order and a copy of the edits, for reading on another
+        # thread. Every row in sort order unless filtered asks for only the
+        # rows that pass the filter bar.
+        return self.frame(), self._view if filtered else self._order, self.edits.snapshot()
+
+    def view_chunks(self, chunk_rows=100000):
+        # The rows the table shows, in its order, with the edits merged in
+        return iter_chunks(*self.snapshot(filtered=True), chunk_rows)
+
+    def undo(self):
+        self._edited(self.edits.undo())
+
+    def redo(self):
+        self._edited(self.edits.redo())
+
+    def cached_order(self, keys):
+        order = self._orders.get(tuple(keys))
+        if order is not None:
+            self._orders.move_to_end(tuple(keys))
+        return order
+
+    def set_order(self, order, keys=None):
+        self.beginResetModel()
+        self._order = order
+        self.sort_keys = keys
+        if keys is not None:
+            self._orders[tuple(keys)] = order
+            self._orders.move_to_end(tuple(keys))
+            if len(self._orders) > self.max_orders:
+                self._orders.popitem(last=False)
+        self._update_view()
+        self.endResetModel()
+
+    def filter_engine(self):
+        # Filter jobs search on another thread, so each edit gets a new engine
+        # over a copy of the edits, keeping the indexes of unedited columns
+        if self._filters is None:
+            self._filters = FilterEngine(self.frame(), edits=self.edits.snapshot())
+        elif self._filter_edits:
+            self._filters = self._filters.updated(self.edits.snapshot(), self._filter_edits)
+        self._filter_edits = set()
+        return self._filters
+
+    def column_stats(self):
+        if self._stats is None:
+            self._stats = ColumnStats(self.frame(), edits=self.edits)
+        return self._stats
+
+    def set_filter(self, rows):
+        self.beginResetModel()
+        self._filter = rows
+        self._update_view()
+        self.endResetModel()
+
+    def _update_view(self, shown=None):
+        # shown is the number of view rows kept in place when rows were only
+        # appended, so formatted blocks before them stay valid
+        view = self._order
+        if self._filter is not None:
+            if view is None:
+                view = self._filter
+            else:
+                keep = np.zeros(self._data.shape[0], dtype=bool)
+                keep[self._filter] = True
+                view = view[keep[view]]
+        self._view = view
+        self._positions = None
+        if shown is None:
+            self._renderer.set_order(view)
+        else:
+            self._renderer.extend(self._data, view, shown)
+
+    def view_row(self, data_row):
+        # Where a data row is shown, or None when the filter hides it
+        if self._view is None:
+            return data_row
+        if self._positions is None:
+            self._positions = np.full(self._data.shape[0], -1, dtype=np.intp)
+            self._positions[self._view] = np.arange(len(self._view))
+        row = int(self._positions[data_row])
+        return None if row < 0 else row
 
     def rowCount(self, parent=None):
-        return self._data.shape[0] 
+        return self._data.shape[0] if self._view is None else len(self._view)
 
     def columnCount(self, parent=None):
         return self._data.shape[1] + 1
 
     def data(self, index, role=Qt.DisplayRole):
+        if tracer.enabled:
+            tracer.count("data()")
         if index.isValid():
             if role == Qt.DisplayRole:
                 if index.column() == 0:  # Row index column
                     return str(index.row() + 1)
                 else:
-                    return str(self._data.iloc[index.row(), index.column() - 1])  # Shift column by 1 to account for row index column
+                    return self._renderer.text(index.row(), index.column() - 1)  # Shift column by 1 to account for row index column
         return None
 
     def headerData(self, col, orientation, role):
+        if tracer.enabled:
+            tracer.count("headerData()")
         if orientation == Qt.Horizontal and role == Qt.DisplayRole:
             if col == 0:  # Row index column header
                 return "#"
             else:
-                return self._data.columns[col - 1]  # Shift column by 1 to account for row index column
+                return str(self._data.columns[col - 1])  # Shift column by 1 to account for row index column
         return None
 
     def setData(self, index, value, role=Qt.EditRole):
-        if role == Qt.EditRole:
+        if role == Qt.EditRole and not isinstance(self._data, MappedCSV):
             row = index.row()
             col = index.column() - 1  # Adjust for row index column
             if col >= 0:
-                self._data.iloc[row, col] = value
-                self.dataChanged.emit(index, index, [Qt.EditRole])
+                data_row = row if self._view is None else int(self._view[row])
+                old = self.cell(data_row, col)
+                self.edits.set(data_row, col, EditOverlay.parse(value, self._data.dtypes.iloc[col]))
+                if self._stats is not None:
+                    self._stats.update(col, old, self.cell(data_row, col))
+                self._edited((data_row, col), row)
                 return True
         return False
 
+    def cell(self, data_row, col):
+        if self.edits.has(data_row, col):
+            return self.edits.get(data_row, col)
+        return self._data.iat[data_row, col]
+
+    def _edited(self, change, row=None):
+        # Brings the caches up to date after a cell changed through an edit,
+        # undo or redo. row is the view row when the caller knows it.
+        if change is None:
+            return
+        data_row, col = change
+        if self._stats is not None:
+            self._stats.invalidate(col)
+        # Orders sorted on this column and its filter indexes are stale now
+        for keys in [keys for keys in self._orders if col in [position for position, _ in keys]]:
+            del self._orders[keys]
+        if self._filters is not None:
+            self._filter_edits.add(col)
+        # Only the block holding the cell is formatted again
+        row = self.view_row(data_row) if row is None else row
+        if row is not None:
+            self._renderer.invalidate(row, col)
+            index = self.index(row, col + 1)
+            self.dataChanged.emit(index, index, [Qt.EditRole])
+
     def flags(self, index):
+        if isinstance(self._data, MappedCSV):
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable  # Mapped files are read-only
         return Qt.ItemIsEditable | Qt.ItemIsEnabled | Qt.ItemIsSelectable
 
-class LoadDataWorker(QRunnable):
-    def __init__(self, file_path, open_with_quotes):
+class Job(QRunnable):
+    # A QRunnable started through JobScheduler; long loops call checkpoint()
+    # so a cancelled or superseded job stops early
+    def __init__(self):
         super().__init__()
-        self.file_path = file_path
-        self.open_with_quotes = open_with_quotes
-        self.data = None
+        self.token = JobToken()
         self.signals = WorkerSignals()
+        self.queued = None
 
     def run(self):
+        kind = self.token.kind or type(self).__name__
+        if tracer.enabled and self.queued is not None:
+            tracer.add(f"{kind} queued", self.queued, time.perf_counter())
+        with tracer.span(kind), tracer.profiled(kind):
+            self.work()
+        if tracer.enabled:
+            tracer.memory()
+
+    def checkpoint(self):
+        self.token.check()
+
+class LoadDataWorker(Job):
+    def __init__(self, file_path, stream=True, workers=None, cache=None, compact=False):
+        super().__init__()
+        self.file_path = file_path
+        self.stream = stream
+        self.loader = CSVLoader(file_path, workers, cache, compact, self.checkpoint)
+        self.data = None
+
+    def work(self):
+        try:
+            self.signals.sniffed.emit(self.loader.sniff())
+            cached = self.loader.load_cached()
+            if self.stream:
+                self.stream_chunks(cached)
+                return
+            self.data = cached if cached is not None else self.loader.read()
+
+            self.checkpoint()
+            self.signals.data_loaded.emit(self.data)
+            if cached is None:
+                self.loader.store_cached(self.data)
+
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+    def stream_chunks(self, cached=None):
+        file_size = max(self.loader.size(), 1)
+        chunks = [(cached, file_size)] if cached is not None else self.loader.chunks()
+        keep = cached is None and self.loader.caching()
+        parsed = []
+        for chunk, position in chunks:
+            self.checkpoint()
+            if keep:
+                parsed.append(chunk)
+            self.signals.chunk_loaded.emit(chunk)
+            self.signals.progress.emit(min(1000, position * 1000 // file_size))
+        self.signals.progress.emit(1000)
+        self.signals.finished.emit()
+        if parsed:
+            self.loader.store_cached(concat_frames(parsed))
+
+class SortWorker(Job):
+    def __init__(self, data, keys, edits=None):
+        super().__init__()
+        self.data = data
+        self.keys = keys
+        self.edits = edits
+
+    def work(self):
         try:
-            if self.open_with_quotes:
-                self.data = pd.read_csv(self.file_path)
-                arr = np.array(self.data)
-                # Use np.vectorize to apply a function to each element of the array
-                quote_func = np.vectorize(lambda x: '"' + str(x) + '"')
-                arr = quote_func(arr)
-
-                self.data=pd.DataFrame(arr)
+            order = sort_permutation(self.data, self.keys, self.edits)
+            self.checkpoint()
+            self.signals.sorted.emit(self.data, self.keys, order)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+class FilterWorker(Job):
+    def __init__(self, data, engine, col, operator, query):
+        super().__init__()
+        self.data = data
+        self.engine = engine
+        self.col = col
+        self.operator = operator
+        self.query = query
+
+    def work(self):
+        try:
+            with tracer.span("filter", query=self.query):
+                rows = self.engine.rows(self.col, self.operator, self.query, self.checkpoint)
+            self.checkpoint()
+            self.signals.filtered.emit(self.data, rows)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+class SaveWorker(Job):
+    def __init__(self, file_path, data, view, edits, quoting, header=True, chunk_rows=100000):
+        super().__init__()
+        self.file_path = file_path
+        self.data = data
+        self.view = view
+        self.edits = edits
+        self.quoting = quoting
+        self.header = header
+        self.chunk_rows = chunk_rows
+
+    def work(self):
+        try:
+            rows = self.data.shape[0] if self.view is None else len(self.view)
+            write_csv(self.file_path, iter_chunks(self.data, self.view, self.edits, self.chunk_rows), rows,
+                      self.quoting, self.signals.progress.emit, lambda: self.token.cancelled, self.header)
+            self.signals.saved.emit(self.file_path)
+        except SaveCancelled:
+            self.signals.save_cancelled.emit(self.file_path)
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+class TailWorker(Job):
+    def __init__(self, reader, data):
+        super().__init__()
+        self.reader = reader
+        self.data = data
+
+    def work(self):
+        try:
+            rows = self.reader.poll()
+            self.checkpoint()
+            if rows is not None and len(rows):
+                # Joined here so the GUI thread only swaps the longer frame in
+                with tracer.span("append rows", rows=len(rows)):
+                    self.signals.tailed.emit(self.reader, concat_frames([self.data, rows]))
             else:
-                self.data = pd.read_csv(self.file_path)
+                self.signals.tailed.emit(self.reader, None)
+        except JobCancelled:
+            pass
+        except FileReset:
+            self.signals.file_reset.emit(self.reader)
+        except Exception as e:
+            self.signals.error.emit(str(e))
 
-            self.signals.data_loaded.emit(self.data)
+class StatsWorker(Job):
+    def __init__(self, stats, workers=None):
+        super().__init__()
+        self.stats = stats
+        # Taken on the GUI thread; edits made while this runs reach the stats
+        # through ColumnStats.update and leave the column dirty
+        self.columns = stats.dirty_columns()
+        self.versions = [stats.version(col) for col in self.columns]
+        self.edits = stats.edits.snapshot()
+        self.workers = workers or min(8, os.cpu_count() or 1)
+
+    def work(self):
+        try:
+            # NumPy and pandas release the GIL in the heavy parts, so columns
+            # computed on threads overlap without copying the data to processes
+            with ThreadPoolExecutor(self.workers) as executor:
+                results = list(executor.map(self.compute, self.columns))
+            self.checkpoint()
+            self.signals.stats_ready.emit(self.stats, list(zip(self.columns, self.versions, results)))
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+    def compute(self, col):
+        self.checkpoint()
+        with tracer.span("stats column", column=col):
+            return self.stats.compute(col, self.edits)
+
+class GroupWorker(Job):
+    def __init__(self, data, view, edits, keys, values, aggregations, pivot=None, chunk_rows=1000000):
+        super().__init__()
+        self.snapshot = (data, view, edits)
+        self.aggregator = GroupAggregator(keys, values, aggregations, pivot)
+        self.chunk_rows = chunk_rows
+
+    def work(self):
+        try:
+            for chunk in iter_chunks(*self.snapshot, self.chunk_rows):
+                self.checkpoint()
+                with tracer.span("group chunk", rows=len(chunk)):
+                    self.aggregator.add(chunk)
+            result = self.aggregator.result()
+            self.checkpoint()
+            self.signals.grouped.emit(result)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+class DiffWorker(Job):
+    max_rows = 100000  # Differences kept for display; all of them are counted
+
+    def __init__(self, old_path, new_path, keys):
+        super().__init__()
+        self.paths = (old_path, new_path)
+        self.keys = keys
+
+    def work(self):
+        try:
+            diff = CSVDiff(*self.paths, self.keys, checkpoint=self.checkpoint, progress=self.signals.progress.emit)
+            kept, rows = [], 0
+            for frame in diff.differences():
+                if rows < self.max_rows or not kept:
+                    kept.append(frame.iloc[:self.max_rows - rows])
+                    rows += len(kept[-1])
+            self.checkpoint()
+            differences = pd.concat(kept, ignore_index=True).sort_values("line", kind="stable", ignore_index=True)
+            self.signals.compared.emit(diff.summary, differences)
+        except JobCancelled:
+            pass
+        except Exception as e:
+            self.signals.error.emit(str(e))
+
+class MapFileWorker(Job):
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
 
+    def work(self):
+        try:
+            mapped = MappedCSV.open(self.file_path, self.progress)
+            if self.token.cancelled:
+                mapped.close()
+                return
+            self.signals.mapped_loaded.emit(mapped)
+        except JobCancelled:
+            pass
         except Exception as e:
             self.signals.error.emit(str(e))
 
+    def progress(self, permille):
+        self.checkpoint()
+        self.signals.progress.emit(permille)
+
+class JobScheduler(QObject):
+    # Starts jobs on a bounded thread pool. Each kind of job has one current
+    # generation: submitting a new one cancels the previous one, and slots
+    # drop results from anything that is no longer current.
+    HIGH = 10  # Work the user is waiting on: loading, sorting, following
+    NORMAL = 5
+    LOW = 0  # Background work such as statistics
+
+    def __init__(self, parent=None, max_workers=None):
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(max_workers or min(4, max(2, os.cpu_count() or 1)))
+        self.jobs = {}  # kind -> current job
+        self.generation = 0
+
+    def submit(self, kind, job, priority=NORMAL):
+        self.cancel(kind)
+        self.generation += 1
+        job.token = JobToken(kind, self.generation)
+        job.signals.token = job.token
+        self.jobs[kind] = job
+        job.queued = time.perf_counter()
+        self.pool.start(job, priority)
+        return job
+
+    def cancel(self, *kinds):
+        for kind in kinds:
+            job = self.jobs.pop(kind, None)
+            if job is not None:
+                job.token.cancel()
+                try:
+                    self.pool.tryTake(job)  # Never started: drop it from the queue
+                except RuntimeError:
+                    pass  # Already finished and deleted by the pool
+
+    def cancel_all(self):
+        self.cancel(*list(self.jobs))
+
+    def is_current(self, sender):
+        # Slots pass self.sender(); direct calls have no sender and always pass
+        token = getattr(sender, "token", None)
+        if token is None:
+            return True
+        job = self.jobs.get(token.kind)
+        return job is not None and job.token is token and not token.cancelled
+
+    def shutdown(self, timeout_ms=3000):
+        self.cancel_all()
+        self.pool.clear()
+        return self.pool.waitForDone(timeout_ms)
+
 class WorkerSignals(QObject):
-    data_loaded = Signal(pd.DataFrame)
+    data_loaded = Signal(object)  # DataFrame
+    sniffed = Signal(object)  # CSVDialect of the file being loaded
+    mapped_loaded = Signal(object)
+    sorted = Signal(object, object, object)  # Sorted data, sort keys, row permutation
+    filtered = Signal(object, object)  # Filtered data, matching rows
+    stats_ready = Signal(object, object)  # ColumnStats, [(column, version, stats)]
+    grouped = Signal(object)  # DataFrame of groups
+    compared = Signal(object, object)  # Summary counts, DataFrame of differences
+    saved = Signal(str)
+    save_cancelled = Signal(str)
+    token = None  # Set by JobScheduler.submit
+    tailed = Signal(object, object)  # TailReader, frame with the appended rows or None
+    file_reset = Signal(object)
+    chunk_loaded = Signal(object)  # DataFrame
+    progress = Signal(int)  # Permille of the file read so far
+    finished = Signal()
     error = Signal(str)
 
 class SortDialog(QDialog):
-    def __init__(self, parent, data):
+    def __init__(self, parent, data, keys=None):
         super().__init__(parent)
         self.setWindowTitle("Sort Data")
         self.data = data
+        columns = [str(column) for column in data.columns]
+        keys = keys or []
 
-        self.column_combo = QComboBox()
-        self.column_combo.addItems(data.columns)
-
-        self.sort_order_combo = QComboBox()
-        self.sort_order_combo.addItems(["Ascending", "Descending"])
+        layout = QVBoxLayout()
+        self.key_combos = []
+        for level, label in enumerate(["Sort by:", "Then by:", "Then by:"]):
+            column_combo = QComboBox()
+            if level:
+                column_combo.addItem("(none)")
+            column_combo.addItems(columns)
+            sort_order_combo = QComboBox()
+            sort_order_combo.addItems(["Ascending", "Descending"])
+            if level < len(keys):
+                position, ascending = keys[level]
+                column_combo.setCurrentIndex(position + (1 if level else 0))
+                sort_order_combo.setCurrentIndex(0 if ascending else 1)
+            row_layout = QHBoxLayout()
+            row_layout.addWidget(column_combo, 3)
+            row_layout.addWidget(sort_order_combo, 1)
+            layout.addWidget(QLabel(label))
+            layout.addLayout(row_layout)
+            self.key_combos.append((column_combo, sort_order_combo))
 
         self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
         self.button_box.accepted.connect(self.sort_data)
         self.button_box.rejected.connect(self.reject)
+        layout.addWidget(self.button_box)
+        self.setLayout(layout)
+
+    def sort_keys(self):
+        keys = []
+        for level, (column_combo, sort_order_combo) in enumerate(self.key_combos):
+            position = column_combo.currentIndex() - (1 if level else 0)
+            if position < 0 or position in [key[0] for key in keys]:
+                continue
+            keys.append((position, sort_order_combo.currentText().lower() == "ascending"))
+        return keys
 
+    def sort_data(self):
+        self.parent().sort_view(self.sort_keys())
+        self.accept()
+
+class DescribeDialog(QDialog):
+    def __init__(self, parent, stats):
+        super().__init__(parent)
+        self.setWindowTitle("Data Description")
+        self.stats = stats
         layout = QVBoxLayout()
-        layout.addWidget(QLabel("Column:"))
-        layout.addWidget(self.column_combo)
-        layout.addWidget(QLabel("Sort Order:"))
-        layout.addWidget(self.sort_order_combo)
+        self.text_edit = QTextEdit()
+        self.text_edit.setReadOnly(True)
+        self.text_edit.setLineWrapMode(QTextEdit.NoWrap)
+        layout.addWidget(self.text_edit)
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok)
+        button_box.accepted.connect(self.accept)
+        layout.addWidget(button_box)
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self, *args):
+        text = self.stats.table().to_string()
+        if self.stats.dirty_columns():
+            text += "\n\n* still computing; the values shown are from before the latest edits"
+        self.text_edit.setPlainText(text)
+
+class GroupDialog(QDialog):
+    def __init__(self, parent, data):
+        super().__init__(parent)
+        self.setWindowTitle("Group By / Pivot")
+        columns = [str(column) for column in data.columns]
+        layout = QVBoxLayout()
+        self.key_combos = []
+        for level, label in enumerate(["Group by:", "Then by:"]):
+            combo = QComboBox()
+            if level:
+                combo.addItem("(none)")
+            combo.addItems(columns)
+            layout.addWidget(QLabel(label))
+            layout.addWidget(combo)
+            self.key_combos.append(combo)
+        layout.addWidget(QLabel("Pivot (one result column per value):"))
+        self.pivot_combo = QComboBox()
+        self.pivot_combo.addItem("(none)")
+        self.pivot_combo.addItems(columns)
+        layout.addWidget(self.pivot_combo)
+        layout.addWidget(QLabel("Values:"))
+        self.value_list = QListWidget()
+        self.value_list.setSelectionMode(QAbstractItemView.MultiSelection)
+        self.value_list.addItems(columns)
+        layout.addWidget(self.value_list)
+        aggregation_layout = QHBoxLayout()
+        self.aggregation_boxes = []
+        for name in AGGREGATIONS:
+            box = QCheckBox(name)
+            box.setChecked(name in ("count", "sum"))
+            aggregation_layout.addWidget(box)
+            self.aggregation_boxes.append(box)
+        layout.addLayout(aggregation_layout)
+
+        self.button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        self.button_box.accepted.connect(self.group_data)
+        self.button_box.rejected.connect(self.reject)
         layout.addWidget(self.button_box)
         self.setLayout(layout)
 
-    def sort_data(self):
-        column = self.column_combo.currentText()
-        sort_order = self.sort_order_combo.currentText().lower() == "ascending"
+    def group_data(self):
+        keys = [self.key_combos[0].currentIndex()]
+        if self.key_combos[1].currentIndex() > 0 and self.key_combos[1].currentIndex() - 1 not in keys:
+            keys.append(self.key_combos[1].currentIndex() - 1)
+        pivot = self.pivot_combo.currentIndex() - 1
+        if pivot in keys:
+            QMessageBox.warning(self, "Warning", "The pivot column can't also be a group key.")
+            return
+        values = sorted(self.value_list.row(item) for item in self.value_list.selectedItems())
+        aggregations = [box.text() for box in self.aggregation_boxes if box.isChecked()]
+        self.parent().group_view(keys, values, aggregations, pivot if pivot >= 0 else None)
+        self.accept()
+
+class ResultDialog(QDialog):
+    # A read-only table of results that can be saved as CSV
+    def __init__(self, parent, title, frame, summary=""):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.frame = frame
+        layout = QVBoxLayout()
+        if summary:
+            summary_label = QLabel(summary)
+            summary_label.setWordWrap(True)
+            layout.addWidget(summary_label)
+        table_view = QTableView()
+        table_view.setModel(PandasModel(frame))
+        table_view.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        layout.addWidget(table_view)
+        button_box = QDialogButtonBox(QDialogButtonBox.Save | QDialogButtonBox.Close)
+        button_box.accepted.connect(self.save)
+        button_box.rejected.connect(self.accept)
+        layout.addWidget(button_box)
+        self.setLayout(layout)
+        self.resize(800, 500)
 
-        try:
-            sorted_data = self.data.sort_values(by=column, ascending=sort_order)
-            parent = self.parent()
-            model = PandasModel(sorted_data)
-            parent.table_view.setModel(model)
-            self.accept()
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+    def save(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "Save Result", "", "CSV Files (*.csv)")
+        if file_path:
+            try:
+                write_csv(file_path, [self.frame], len(self.frame))
+            except Exception as e:
+                QMessageBox.critical(self, "Error", str(e))
 
 class CSVReaderApp(QMainWindow):
     def __init__(self):
@@ -127,7 +737,20 @@ class CSVReaderApp(QMainWindow):
         self.file_path = None
         self.data = None
         self.worker_thread = None
-        self.open_with_quotes = False  # Track whether to open with quotes
+        self.open_with_quotes = False  # Track whether to show and save fields with quotes
+        self.save_filtered = False  # Save only the rows that pass the filter bar
+        self.file_header = True  # Whether the loaded file had a header line
+        self.stream_load = True  # Show rows while the file is still being parsed
+        self.stream_model = None
+        self.cache = SidecarCache()
+        self.use_cache = True  # Re-open large files from their columnar sidecar
+        self.compact_load = False  # Parse into categorical / narrow numeric dtypes
+        self.follow_file = False  # Append rows as the open file grows, like tail -f
+        self.follow_reader = None
+        self.follow_busy = False
+        self.follow_again = False
+        self.filter_busy = False  # A filter job for the latest query is running
+        self.save_worker = None
         self.table_view = QTableView()
         self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
         self.table_view.setEditTriggers(QAbstractItemView.DoubleClicked |
@@ -135,9 +758,36 @@ class CSVReaderApp(QMainWindow):
 
         self.progress_bar = QProgressBar()
         self.progress_bar.setMaximum(0)  # Indicates infinite progress
-
-        preloaded_file_path = "merry.csv"
-        self.load_preloaded_data(preloaded_file_path)
+        self.cancel_save_button = QPushButton("Cancel Save")
+        self.cancel_save_button.clicked.connect(self.cancel_save)
+        self.cancel_save_button.hide()
+
+        self.filter_column_combo = QComboBox()
+        self.filter_operator_combo = QComboBox()
+        self.filter_operator_combo.addItems(FilterEngine.operators)
+        self.filter_input = QLineEdit()
+        self.filter_input.setPlaceholderText("Filter rows (between takes low..high)")
+        # Wait for a pause in typing before filtering
+        self.filter_timer = QTimer(self)
+        self.filter_timer.setSingleShot(True)
+        self.filter_timer.setInterval(150)
+        self.filter_timer.timeout.connect(self.apply_filter)
+        self.filter_input.textChanged.connect(lambda: self.filter_timer.start())
+        self.filter_column_combo.currentIndexChanged.connect(lambda: self.filter_timer.start())
+        self.filter_operator_combo.currentIndexChanged.connect(lambda: self.filter_timer.start())
+
+        self.jobs = JobScheduler(self)
+
+        # The watcher reacts to writes straight away; the timer covers file
+        # systems that do not report changes and watches lost on rotation
+        self.follow_watcher = QFileSystemWatcher(self)
+        self.follow_watcher.fileChanged.connect(self.poll_follow)
+        self.follow_timer = QTimer(self)
+        self.follow_timer.setInterval(1000)
+        self.follow_timer.timeout.connect(self.poll_follow)
+
+        # Loaded in the background once the window has painted (see paintEvent)
+        self.preloaded_file_path = "merry.csv"
 
         self.open_button = QPushButton("Open CSV File")
         self.open_button.setCheckable(True)
@@ -152,7 +802,14 @@ class CSVReaderApp(QMainWindow):
         splitter = QSplitter(Qt.Vertical)
         splitter.addWidget(self.table_view)
         splitter.addWidget(self.progress_bar)
+        filter_layout = QHBoxLayout()
+        filter_layout.addWidget(QLabel("Filter:"))
+        filter_layout.addWidget(self.filter_column_combo)
+        filter_layout.addWidget(self.filter_operator_combo)
+        filter_layout.addWidget(self.filter_input, 1)
+        layout.addLayout(filter_layout)
         layout.addWidget(splitter)
+        layout.addWidget(self.cancel_save_button)
         layout.addWidget(self.open_button)
         layout.addWidget(self.status_label)
 
@@ -162,7 +819,7 @@ class CSVReaderApp(QMainWindow):
         self.left_button = QPushButton("Left",)
         self.right_button = QPushButton("Right")
         #css properties
-        for butt in [self.up_button,self.down_button,self.left_button,self.right_button,self.save,self.open_button]:
+        for butt in [self.up_button,self.down_button,self.left_button,self.right_button,self.save,self.open_button,self.cancel_save_button]:
             butt.setStyleSheet("background-color: rgb(248, 233, 191);border-radius:5px;")
             butt.setFont('Times')
 
@@ -189,8 +846,14 @@ class CSVReaderApp(QMainWindow):
 
         self.status_bar = QStatusBar()
         self.setStatusBar(self.status_bar)
-
-        self.threadpool = QThreadPool()
+        self.overlay_label = QLabel()
+        self.overlay_label.hide()
+        self.status_bar.addPermanentWidget(self.overlay_label)
+        self.overlay_timer = QTimer(self)
+        self.overlay_timer.setInterval(500)
+        self.overlay_timer.timeout.connect(self.update_overlay)
+        self.paint_calls = (0, 0)  # data() and headerData() calls in the last repaint
+        self.last_profile = None
 
         self.create_menus()
 
@@ -208,11 +871,48 @@ class CSVReaderApp(QMainWindow):
         open_action.triggered.connect(self.open_file)
         file_menu.addAction(open_action)
 
+        open_mapped_action = QAction("Open &Large File (Memory-Mapped)", self)
+        open_mapped_action.triggered.connect(self.open_mapped_file)
+        file_menu.addAction(open_mapped_action)
+
         open_with_action = QAction("&Use Quotes", self)
         open_with_action.setCheckable(True)
         open_with_action.toggled.connect(self.toggle_open_with_quotes)
         file_menu.addAction(open_with_action)
 
+        save_filtered_action = QAction("Save &Filtered Rows Only", self)
+        save_filtered_action.setCheckable(True)
+        save_filtered_action.toggled.connect(self.toggle_save_filtered)
+        file_menu.addAction(save_filtered_action)
+
+        stream_action = QAction("S&tream Large Files", self)
+        stream_action.setCheckable(True)
+        stream_action.setChecked(self.stream_load)
+        stream_action.toggled.connect(self.toggle_stream_load)
+        file_menu.addAction(stream_action)
+
+        cache_action = QAction("Use Sidecar &Cache", self)
+        cache_action.setCheckable(True)
+        cache_action.setChecked(self.use_cache)
+        cache_action.toggled.connect(self.toggle_use_cache)
+        file_menu.addAction(cache_action)
+
+        compact_action = QAction("Compact &Memory on Load", self)
+        compact_action.setCheckable(True)
+        compact_action.setChecked(self.compact_load)
+        compact_action.toggled.connect(self.toggle_compact_load)
+        file_menu.addAction(compact_action)
+
+        follow_action = QAction("&Follow File", self)
+        follow_action.setCheckable(True)
+        follow_action.setChecked(self.follow_file)
+        follow_action.toggled.connect(self.toggle_follow_file)
+        file_menu.addAction(follow_action)
+
+        show_cache_action = QAction("Manage Cac&he...", self)
+        show_cache_action.triggered.connect(self.show_cache_dialog)
+        file_menu.addAction(show_cache_action)
+
         save_action = QAction("&Save CSV File", self)
         save_action.triggered.connect(self.save_file)
         file_menu.addAction(save_action)
@@ -220,6 +920,16 @@ class CSVReaderApp(QMainWindow):
         edit_menu = QMenu("&Edit", self)
         menu_bar.addMenu(edit_menu)
 
+        undo_action = QAction("&Undo", self)
+        undo_action.setShortcut(QKeySequence.Undo)
+        undo_action.triggered.connect(self.undo_edit)
+        edit_menu.addAction(undo_action)
+
+        redo_action = QAction("&Redo", self)
+        redo_action.setShortcut(QKeySequence.Redo)
+        redo_action.triggered.connect(self.redo_edit)
+        edit_menu.addAction(redo_action)
+
         go_to_action = QAction("&Go to...", self)
         go_to_action.triggered.connect(self.go_to_row)
         edit_menu.addAction(go_to_action)
@@ -231,6 +941,10 @@ class CSVReaderApp(QMainWindow):
         sort_action.triggered.connect(self.open_sort_dialog)
         sort_menu.addAction(sort_action)
 
+        reset_sort_action = QAction("&Reset Sort", self)
+        reset_sort_action.triggered.connect(self.reset_sort)
+        sort_menu.addAction(reset_sort_action)
+
         describe_action = QAction("&Describe Data", self)
         describe_action.triggered.connect(self.describe_data)
         edit_menu.addAction(describe_action)
@@ -243,6 +957,18 @@ class CSVReaderApp(QMainWindow):
         row_count_action.triggered.connect(self.get_row_count)
         edit_menu.addAction(row_count_action)
 
+        memory_action = QAction("&Memory Report", self)
+        memory_action.triggered.connect(self.show_memory_report)
+        edit_menu.addAction(memory_action)
+
+        group_action = QAction("&Group By / Pivot...", self)
+        group_action.triggered.connect(self.open_group_dialog)
+        edit_menu.addAction(group_action)
+
+        compare_action = QAction("&Compare with File...", self)
+        compare_action.triggered.connect(self.compare_with_file)
+        edit_menu.addAction(compare_action)
+
         help_menu = QMenu("&Help", self)
         menu_bar.addMenu(help_menu)
 
@@ -250,19 +976,261 @@ class CSVReaderApp(QMainWindow):
         help_action.triggered.connect(self.show_help_dialog)
         help_menu.addAction(help_action)
 
+        overlay_action = QAction("Performance &Overlay", self)
+        overlay_action.setCheckable(True)
+        overlay_action.toggled.connect(self.toggle_overlay)
+        help_menu.addAction(overlay_action)
+
+        export_trace_action = QAction("Export &Trace...", self)
+        export_trace_action.triggered.connect(self.export_trace)
+        help_menu.addAction(export_trace_action)
+
+        profile_menu = help_menu.addMenu("&Profile with cProfile")
+        for kind, label in (("load", "&Loading"), ("sort", "&Sorting"), ("stats", "&Describe Data"), ("save", "Sa&ving"),
+                            ("group", "&Group By"), ("diff", "&Compare")):
+            profile_action = QAction(label, self)
+            profile_action.setCheckable(True)
+            profile_action.setData(kind)
+            profile_action.toggled.connect(self.toggle_profile)
+            profile_menu.addAction(profile_action)
+
+    def toggle_overlay(self, checked):
+        tracer.enabled = checked
+        self.overlay_label.setVisible(checked)
+        if checked:
+            self.table_view.viewport().installEventFilter(self)
+            self.overlay_timer.start()
+            self.update_overlay()
+        else:
+            self.table_view.viewport().removeEventFilter(self)
+            self.overlay_timer.stop()
+
+    def eventFilter(self, obj, event):
+        # The calls counted since the previous paint are the ones that paint made
+        if event.type() == QEvent.Paint and tracer.enabled:
+            self.paint_calls = (tracer.take_count("data()"), tracer.take_count("headerData()"))
+            tracer.counter("calls per repaint", data=self.paint_calls[0], headerData=self.paint_calls[1])
+        return super().eventFilter(obj, event)
+
+    def update_overlay(self):
+        parts = [f"paint: {self.paint_calls[0]} data() / {self.paint_calls[1]} headerData()"]
+        for kind, label in (("load", "load"), ("sort", "sort"), ("filter", "filter"), ("stats", "describe"),
+                            ("save", "save")):
+            if kind in tracer.last:
+                parts.append(f"{label} {tracer.last[kind] * 1000:.0f} ms")
+        waits = [seconds for name, seconds in tracer.last.items() if name.endswith(" queued")]
+        if waits:
+            parts.append(f"queue {max(waits) * 1000:.0f} ms")
+        rss = tracer.memory()
+        if rss is not None:
+            parts.append(f"{rss:.0f} MB")
+        self.overlay_label.setText("  |  ".join(parts))
+        self.check_profile()
+
+    def toggle_profile(self, checked):
+        kind = self.sender().data()
+        if checked:
+            tracer.profile_kinds.add(kind)
+            self.overlay_timer.start()  # Also reports where the profile was saved
+        else:
+            tracer.profile_kinds.discard(kind)
+            if not tracer.enabled and not tracer.profile_kinds:
+                self.overlay_timer.stop()
+
+    def check_profile(self):
+        if tracer.last_profile != self.last_profile:
+            self.last_profile = tracer.last_profile
+            self.status_bar.showMessage(f"Profile saved to {self.last_profile}", 10000)
+
+    def export_trace(self):
+        if not tracer.events:
+            QMessageBox.information(self, "Export Trace", "Nothing has been recorded yet. "
+                                    "Turn on the performance overlay and repeat the slow operation first.")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Export Trace", "merry-trace.json", "Trace Files (*.json)")
+        if file_path:
+            try:
+                count = tracer.export(file_path)
+                self.status_bar.showMessage(f"Wrote {count} trace events to {file_path}", 5000)
+            except OSError as e:
+                self.show_error(str(e))
+
     def toggle_open_with_quotes(self, checked):
             self.open_with_quotes = checked
+            model = self.table_view.model()
+            if model is not None:
+                model.set_quoted(checked)
+
+    def toggle_save_filtered(self, checked):
+        self.save_filtered = checked
+
+    def toggle_stream_load(self, checked):
+        self.stream_load = checked
+
+    def toggle_use_cache(self, checked):
+        self.use_cache = checked
+
+    def toggle_compact_load(self, checked):
+        self.compact_load = checked
+
+    def toggle_follow_file(self, checked):
+        self.follow_file = checked
+        if checked:
+            self.start_follow()
+        else:
+            self.stop_follow()
+
+    def start_follow(self):
+        self.stop_follow()
+        if not self.follow_file or self.data is None or isinstance(self.data, MappedCSV) or self.file_path is None:
+            return
+        self.follow_reader = TailReader(self.file_path, self.data, self.compact_load)
+        self.follow_watcher.addPath(self.file_path)
+        self.follow_timer.start()
+        self.poll_follow()
+
+    def stop_follow(self):
+        self.jobs.cancel("follow")
+        self.follow_reader = None
+        self.follow_busy = False
+        self.follow_again = False
+        self.follow_timer.stop()
+        if self.follow_watcher.files():
+            self.follow_watcher.removePaths(self.follow_watcher.files())
+
+    def poll_follow(self):
+        # One poll in flight at a time; writes arriving meanwhile are picked
+        # up by a single follow-up poll, so bursts are parsed in batches
+        if self.follow_reader is None:
+            return
+        if self.follow_busy:
+            self.follow_again = True
+            return
+        self.follow_busy = True
+        self.follow_again = False
+        worker = TailWorker(self.follow_reader, self.data)
+        worker.signals.tailed.connect(self.follow_tailed)
+        worker.signals.file_reset.connect(self.follow_reset)
+        worker.signals.error.connect(self.follow_failed)
+        self.jobs.submit("follow", worker, JobScheduler.HIGH)
+
+    def follow_tailed(self, reader, data):
+        if reader is not self.follow_reader:
+            return
+        self.follow_busy = False
+        if data is not None:
+            model = self.table_view.model()
+            scroll_bar = self.table_view.verticalScrollBar()
+            at_end = scroll_bar.value() == scroll_bar.maximum()
+            model.extend(data)
+            self.data = data
+            if at_end:
+                self.table_view.scrollToBottom()
+            self.status_bar.showMessage(f"Following: {len(self.data)} rows", 5000)
+        if self.file_path not in self.follow_watcher.files() and os.path.exists(self.file_path):
+            self.follow_watcher.addPath(self.file_path)
+        if self.follow_again or reader.pending():
+            self.poll_follow()
+
+    def follow_reset(self, reader):
+        if reader is not self.follow_reader:
+            return
+        # Truncated or rotated: reload the whole file, following resumes once loaded
+        self.stop_follow()
+        self.status_bar.showMessage("File was truncated or replaced; reloading", 5000)
+        if os.path.exists(self.file_path):
+            self.load_data_async()
+
+    def follow_failed(self, error_message):
+        if not self.jobs.is_current(self.sender()):
+            return
+        self.stop_follow()
+        self.show_error(error_message)
+
+    def show_cache_dialog(self):
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Sidecar Cache")
+        layout = QVBoxLayout()
+        text_edit = QTextEdit()
+        text_edit.setReadOnly(True)
+
+        def refresh():
+            entries = sorted(self.cache.entries(), key=lambda entry: entry[3], reverse=True)
+            total = sum(entry[2] for entry in entries)
+            lines = [f"Cache folder: {self.cache.directory}",
+                     f"Using {total / 1024 ** 2:.1f} MB of {self.cache.max_bytes / 1024 ** 2:.0f} MB", ""]
+            for _, source, size, used in entries:
+                lines.append(f"{size / 1024 ** 2:10.1f} MB  {time.strftime('%Y-%m-%d %H:%M', time.localtime(used))}  {source}")
+            text_edit.setPlainText("\n".join(lines))
+
+        def clear():
+            self.cache.clear()
+            refresh()
+
+        refresh()
+        layout.addWidget(text_edit)
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok)
+        clear_button = button_box.addButton("Clear Cache", QDialogButtonBox.ResetRole)
+        clear_button.clicked.connect(clear)
+        button_box.accepted.connect(dialog.accept)
+        layout.addWidget(button_box)
+        dialog.setLayout(layout)
+        dialog.exec()
 
     def open_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", "CSV Files (*.csv)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", OPEN_FILTER)
         if file_path:
             self.file_path = file_path
             self.status_label.setText(f"Selected file: {file_path}")
             self.load_data_async()
 
+    def open_mapped_file(self):
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open Large CSV File", "", "CSV Files (*.csv *.tsv *.txt);;All Files (*)")
+        if file_path:
+            self.file_path = file_path
+            self.status_label.setText(f"Selected file: {file_path} (memory-mapped, read-only)")
+            worker = MapFileWorker(file_path)
+            worker.signals.mapped_loaded.connect(self.mapped_loaded)
+            worker.signals.progress.connect(self.load_progress)
+            worker.signals.error.connect(self.show_error)
+            self.stop_follow()
+            self.jobs.cancel("sort", "stats", "group", "filter")
+            self.data = None
+            self.stream_model = None
+            self.progress_bar.setMaximum(0)
+            self.jobs.submit("load", worker, JobScheduler.HIGH)
+
+    def mapped_loaded(self, mapped):
+        if not self.jobs.is_current(self.sender()):
+            mapped.close()
+            return
+        self.data = mapped
+        self.show_model(PandasModel(mapped, self.open_with_quotes))
+        self.progress_bar.setMaximum(1000)
+        self.progress_bar.setValue(1000)
+        self.status_bar.showMessage(f"Mapped {len(mapped)} rows", 10000)
+
+    def require_frame(self):
+        # Whole-table operations need the data in memory
+        if self.data is None:
+            QMessageBox.warning(self, "Warning", "No data loaded yet.")
+            return False
+        if isinstance(self.data, MappedCSV):
+            QMessageBox.warning(self, "Warning", "This operation is not available for memory-mapped files.")
+            return False
+        return True
+
+    def undo_edit(self):
+        if self.table_view.model() is not None:
+            self.table_view.model().undo()
+
+    def redo_edit(self):
+        if self.table_view.model() is not None:
+            self.table_view.model().redo()
+
     def go_to_row(self):
         if self.data is not None:
-            row_count = len(self.data)
+            row_count = self.table_view.model().rowCount()
             input_dialog = QDialog(self)
             input_dialog.setWindowTitle("Go to Row")
             layout = QVBoxLayout()
@@ -284,9 +1252,10 @@ class CSVReaderApp(QMainWindow):
     def handle_go_to_row(self, row_index_text, dialog):
         try:
             row_index = int(row_index_text)
-            row_count = len(self.data)
+            row_count = self.table_view.model().rowCount()
             if 0 <= row_index < row_count:
                 self.table_view.selectRow(row_index)
+                self.table_view.scrollTo(self.table_view.model().index(row_index, 0))
                 dialog.accept()
             else:
                 QMessageBox.warning(self, "Warning", f"Row index must be between 0 and {row_count - 1}.")
@@ -294,52 +1263,260 @@ class CSVReaderApp(QMainWindow):
             QMessageBox.warning(self, "Warning", "Invalid row index. Please enter an integer.")
 
     def open_sort_dialog(self):
-        if self.data is not None:
-            dialog = SortDialog(self, self.data)
+        if self.require_frame():
+            dialog = SortDialog(self, self.data, self.table_view.model().sort_keys)
             dialog.exec()
-        else:
-            QMessageBox.warning(self, "Warning", "No data loaded yet.")
 
     def open_file(self):
-        file_path, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", "CSV Files (*.csv)")
+        file_path, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", OPEN_FILTER)
         if file_path:
             self.file_path = file_path
             self.status_label.setText(f"Selected file: {file_path}")
             self.load_data_async()
 
-    def load_preloaded_data(self, file_path):
-        try:
-            self.data = pd.read_csv(file_path)
-            model = PandasModel(self.data)
+    def show_model(self, model):
+        with tracer.span("model swap"):
             self.table_view.setModel(model)
-        except Exception as e:
-            QMessageBox.critical(self, "Error", str(e))
+        self.filter_column_combo.blockSignals(True)
+        self.filter_column_combo.clear()
+        self.filter_column_combo.addItems(["All columns"] + [model.headerData(col, Qt.Horizontal, Qt.DisplayRole)
+                                                         for col in range(1, model.columnCount())])
+        self.filter_column_combo.blockSignals(False)
+        self.filter_input.clear()
+
+    def apply_filter(self):
+        model = self.table_view.model()
+        if model is None or self.data is None or isinstance(self.data, MappedCSV):
+            return
+        query = self.filter_input.text()
+        if not query:
+            self.jobs.cancel("filter")
+            self.filter_busy = False
+            model.set_filter(None)
+            return
+        col = self.filter_column_combo.currentIndex() - 1  # "All columns" comes first
+        # Each keystroke supersedes the search still running for the last one
+        worker = FilterWorker(self.data, model.filter_engine(), None if col < 0 else col,
+                              self.filter_operator_combo.currentText(), query)
+        worker.signals.filtered.connect(self.filtered)
+        worker.signals.error.connect(self.filter_failed)
+        self.filter_busy = True
+        self.jobs.submit("filter", worker, JobScheduler.HIGH)
+
+    def filtered(self, data, rows):
+        if not self.jobs.is_current(self.sender()):
+            return
+        self.filter_busy = False
+        if data is not self.data:
+            return  # Another file was opened meanwhile
+        self.table_view.model().set_filter(rows)
+        self.status_bar.showMessage(f"{len(rows)} of {len(self.data)} rows match", 3000)
+
+    def filter_failed(self, error_message):
+        if not self.jobs.is_current(self.sender()):
+            return
+        self.filter_busy = False
+        self.status_bar.showMessage(error_message, 3000)
+
+    def sort_view(self, keys):
+        model = self.table_view.model()
+        order = model.cached_order(keys)
+        if order is not None:
+            model.set_order(order, keys)
+            return
+        worker = SortWorker(self.data, keys, model.edits.snapshot())
+        worker.signals.sorted.connect(self.sort_finished)
+        worker.signals.error.connect(self.show_error)
+        self.status_bar.showMessage("Sorting...")
+        self.jobs.submit("sort", worker, JobScheduler.HIGH)
+
+    def sort_finished(self, data, keys, order):
+        if data is not self.data or not self.jobs.is_current(self.sender()):
+            return  # Another file was opened or another sort started meanwhile
+        self.table_view.model().set_order(order, keys)
+        self.status_bar.showMessage("Data sorted", 3000)
+
+    def reset_sort(self):
+        model = self.table_view.model()
+        if model is not None and model.sort_keys is not None:
+            model.set_order(None)
+
+    def paintEvent(self, event):
+        super().paintEvent(event)
+        if self.preloaded_file_path is not None:
+            file_path, self.preloaded_file_path = self.preloaded_file_path, None
+            if self.file_path is None:  # Unless a file was opened already
+                QTimer.singleShot(0, lambda: self.load_preloaded_data(file_path))
+
+    def load_preloaded_data(self, file_path):
+        self.file_path = file_path
+        self.load_data_async()
 
     def load_data_async(self):
-        worker = LoadDataWorker(self.file_path, self.open_with_quotes)
+        worker = LoadDataWorker(self.file_path, self.stream_load,
+                                cache=self.cache if self.use_cache else None,
+                                compact=self.compact_load)
+        worker.signals.sniffed.connect(self.sniffed)
         worker.signals.data_loaded.connect(self.data_loaded)
+        worker.signals.chunk_loaded.connect(self.chunk_loaded)
+        worker.signals.progress.connect(self.load_progress)
+        worker.signals.finished.connect(self.stream_finished)
         worker.signals.error.connect(self.show_error)
-        self.threadpool.start(worker)
+        self.stop_follow()
+        self.jobs.cancel("sort", "stats", "group", "filter")
+        self.data = None
+        self.stream_model = None
+        self.file_header = True
+        self.progress_bar.setMaximum(0)
+        self.jobs.submit("load", worker, JobScheduler.HIGH)
         self.progress_bar.setValue(1)
 
+    def sniffed(self, dialect):
+        if self.jobs.is_current(self.sender()):
+            self.file_header = dialect.header  # Saved back the same way
+
+    def chunk_loaded(self, chunk):
+        if not self.jobs.is_current(self.sender()):
+            return
+        if self.stream_model is None:
+            self.stream_model = PandasModel(chunk, self.open_with_quotes)
+            self.show_model(self.stream_model)
+        else:
+            self.stream_model.append_chunk(chunk)
+
+    def load_progress(self, permille):
+        if not self.jobs.is_current(self.sender()):
+            return
+        self.progress_bar.setMaximum(1000)
+        self.progress_bar.setValue(permille)
+        self.status_bar.showMessage(f"Loading... {permille / 10:.1f}%")
+
+    def stream_finished(self):
+        if self.stream_model is None or not self.jobs.is_current(self.sender()):
+            return
+        self.data = self.stream_model.frame()
+        self.stream_model = None
+        self.status_bar.showMessage(f"Data loaded with {len(self.data)} rows", 10000)
+        self.start_follow()
+
     def data_loaded(self, data):
+        if not self.jobs.is_current(self.sender()):
+            return  # A newer load has replaced this one
         self.data = data
-        model = PandasModel(data)
-        self.table_view.setModel(model)
+        model = PandasModel(data, self.open_with_quotes)
+        self.show_model(model)
         self.progress_bar.setMaximum(1)  # Reset progress bar
         self.status_bar.showMessage(f"Data loaded with {len(data)} rows", 10000)
+        self.start_follow()
 
     def show_error(self, error_message):
+        if not self.jobs.is_current(self.sender()):
+            return
         QMessageBox.critical(self, "Error", error_message)
 
     def describe_data(self):
+        if self.require_frame():
+            stats = self.table_view.model().column_stats()
+            dialog = DescribeDialog(self, stats)
+            if stats.dirty_columns():
+                worker = StatsWorker(stats)
+                worker.signals.stats_ready.connect(self.stats_ready)
+                worker.signals.stats_ready.connect(dialog.refresh)
+                worker.signals.error.connect(self.show_error)
+                self.jobs.submit("stats", worker, JobScheduler.LOW)
+            dialog.exec()
+
+    def stats_ready(self, stats, results):
+        if not self.jobs.is_current(self.sender()):
+            return
+        for col, version, column_stats in results:
+            stats.store(col, column_stats, version)
+
+    def open_group_dialog(self):
+        if self.require_frame():
+            dialog = GroupDialog(self, self.data)
+            dialog.exec()
+
+    def group_view(self, keys, values, aggregations, pivot=None):
+        # Groups the rows as shown (sort and filter applied, edits included)
+        worker = GroupWorker(*self.table_view.model().snapshot(filtered=True), keys, values, aggregations, pivot)
+        worker.signals.grouped.connect(self.grouped)
+        worker.signals.error.connect(self.show_error)
+        self.status_bar.showMessage("Grouping...")
+        self.jobs.submit("group", worker, JobScheduler.NORMAL)
+
+    def grouped(self, result):
+        if not self.jobs.is_current(self.sender()):
+            return
+        self.status_bar.showMessage(f"{len(result)} groups", 3000)
+        ResultDialog(self, "Group By / Pivot", result).exec()
+
+    def compare_with_file(self):
+        if self.data is None or self.file_path is None:
+            QMessageBox.warning(self, "Warning", "No data loaded yet.")
+            return
+        old_path, _ = QFileDialog.getOpenFileName(self, "Compare with File", "", OPEN_FILTER)
+        if not old_path:
+            return
+        dialog = QDialog(self)
+        dialog.setWindowTitle("Compare with File")
+        layout = QVBoxLayout()
+        note = f"Rows of {os.path.basename(old_path)} (old) are matched to {os.path.basename(self.file_path)} (new) as saved on disk."
+        note_label = QLabel(note)
+        note_label.setWordWrap(True)
+        layout.addWidget(note_label)
+        key_combos = []
+        for level, label in enumerate(["Match rows on:", "And on:"]):
+            combo = QComboBox()
+            if level:
+                combo.addItem("(none)")
+            combo.addItems([str(column) for column in self.data.columns])
+            layout.addWidget(QLabel(label))
+            layout.addWidget(combo)
+            key_combos.append(combo)
+        button_box = QDialogButtonBox(QDialogButtonBox.Ok | QDialogButtonBox.Cancel)
+        button_box.accepted.connect(dialog.accept)
+        button_box.rejected.connect(dialog.reject)
+        layout.addWidget(button_box)
+        dialog.setLayout(layout)
+        if not dialog.exec():
+            return
+        keys = [key_combos[0].currentText()]
+        if key_combos[1].currentIndex() > 0 and key_combos[1].currentText() not in keys:
+            keys.append(key_combos[1].currentText())
+        worker = DiffWorker(old_path, self.file_path, keys)
+        worker.signals.compared.connect(self.compared)
+        worker.signals.progress.connect(self.compare_progress)
+        worker.signals.error.connect(self.show_error)
+        self.jobs.submit("diff", worker, JobScheduler.NORMAL)
+
+    def compare_progress(self, permille):
+        if self.jobs.is_current(self.sender()):
+            self.status_bar.showMessage(f"Comparing... {permille / 10:.1f}%")
+
+    def compared(self, summary, differences):
+        if not self.jobs.is_current(self.sender()):
+            return
+        self.status_bar.clearMessage()
+        lines = [", ".join(f"{summary[name]} {name}" for name in ("removed", "added", "changed", "unchanged")) +
+                 f" (old {summary['old rows']} rows, new {summary['new rows']})"]
+        if summary["repeated keys"]:
+            lines.append(f"{summary['repeated keys']} rows repeat a key; they are matched in file order.")
+        for side in ("old", "new"):
+            if summary[f"only in {side}"]:
+                lines.append(f"Only in {side}: {', '.join(summary[f'only in {side}'])} (not compared)")
+        if len(differences) < summary["removed"] + summary["added"] + summary["changed"]:
+            lines.append(f"Showing {len(differences)} of the differences; python merry.py diff writes all of them.")
+        ResultDialog(self, "Compare with File", differences, "\n".join(lines)).exec()
+
+    def get_column_names(self):
         if self.data is not None:
             dialog = QDialog(self)
-            dialog.setWindowTitle("Data Description")
+            dialog.setWindowTitle("Column Names")
             layout = QVBoxLayout()
             text_edit = QTextEdit()
             text_edit.setReadOnly(True)
-            text_edit.setPlainText(str(self.data.describe()))
+            text_edit.setPlainText(", ".join(map(str, self.data.columns)))
             layout.addWidget(text_edit)
             button_box = QDialogButtonBox(QDialogButtonBox.Ok)
             button_box.accepted.connect(dialog.accept)
@@ -349,22 +1526,27 @@ class CSVReaderApp(QMainWindow):
         else:
             QMessageBox.warning(self, "Warning", "No data loaded yet.")
 
-    def get_column_names(self):
-        if self.data is not None:
+    def show_memory_report(self):
+        if self.require_frame():
+            report = memory_report(self.table_view.model().frame(), self.file_path)
+            lines = [f"{'column':<24} {'dtype':<16} {'default':>12} {'now':>12}"]
+            for name, dtype, before, after in report.itertuples(index=False):
+                before = "?" if pd.isna(before) else f"{before / 1024 ** 2:.1f} MB"
+                lines.append(f"{name[:24]:<24} {dtype[:16]:<16} {before:>12} {after / 1024 ** 2:9.1f} MB")
             dialog = QDialog(self)
-            dialog.setWindowTitle("Column Names")
+            dialog.setWindowTitle("Memory Report")
             layout = QVBoxLayout()
             text_edit = QTextEdit()
             text_edit.setReadOnly(True)
-            text_edit.setPlainText(", ".join(self.data.columns))
+            text_edit.setFontFamily("monospace")
+            text_edit.setPlainText("\n".join(lines))
             layout.addWidget(text_edit)
             button_box = QDialogButtonBox(QDialogButtonBox.Ok)
             button_box.accepted.connect(dialog.accept)
             layout.addWidget(button_box)
             dialog.setLayout(layout)
+            dialog.resize(640, 400)
             dialog.exec()
-        else:
-            QMessageBox.warning(self, "Warning", "No data loaded yet.")
 
     def get_row_count(self):
         if self.data is not None:
@@ -384,13 +1566,48 @@ class CSVReaderApp(QMainWindow):
             QMessageBox.warning(self, "Warning", "No data loaded yet.")
 
     def save_file(self):
-        if self.data is not None:
-            file_path, _ = QFileDialog.getSaveFileName(self, "Save CSV File", "", "CSV Files (*.csv)")
+        if self.require_frame():
+            if self.save_worker is not None:
+                QMessageBox.warning(self, "Warning", "A save is already in progress.")
+                return
+            file_path, _ = QFileDialog.getSaveFileName(
+                self, "Save CSV File", "", "CSV Files (*.csv);;Compressed CSV Files (*.csv.gz *.csv.bz2 *.csv.xz *.csv.zst)")
             if file_path:
-                self.data.to_csv(file_path, index=False)
-                self.status_bar.showMessage(f"Data saved to {file_path}", 3000)
+                quoting = csv.QUOTE_ALL if self.open_with_quotes else csv.QUOTE_MINIMAL
+                data, view, edits = self.table_view.model().snapshot(filtered=self.save_filtered)
+                self.save_worker = SaveWorker(file_path, data, view, edits, quoting, self.file_header)
+                self.save_worker.signals.progress.connect(self.save_progress)
+                self.save_worker.signals.saved.connect(self.save_finished)
+                self.save_worker.signals.save_cancelled.connect(self.save_finished)
+                self.save_worker.signals.error.connect(self.save_failed)
+                self.cancel_save_button.show()
+                self.progress_bar.setMaximum(1000)
+                self.progress_bar.setValue(0)
+                self.jobs.submit("save", self.save_worker, JobScheduler.NORMAL)
+
+    def save_progress(self, permille):
+        self.progress_bar.setValue(permille)
+        self.status_bar.showMessage(f"Saving... {permille / 10:.1f}%")
+
+    def cancel_save(self):
+        if self.save_worker is not None:
+            # Cooperative, so the worker still reports back through save_finished
+            self.save_worker.token.cancel()
+
+    def save_finished(self, file_path):
+        cancelled = self.save_worker.token.cancelled
+        self.save_worker = None
+        self.cancel_save_button.hide()
+        self.progress_bar.setValue(1000)
+        if cancelled:
+            self.status_bar.showMessage(f"Save cancelled; {file_path} was left unchanged", 5000)
         else:
-            QMessageBox.warning(self, "Warning", "No data loaded yet.")
+            self.status_bar.showMessage(f"Data saved to {file_path}", 3000)
+
+    def save_failed(self, error_message):
+        self.save_worker = None
+        self.cancel_save_button.hide()
+        self.show_error(error_message)
 
     def navigate_up(self):
         current_index = self.table_view.currentIndex()
@@ -436,9 +1653,16 @@ class CSVReaderApp(QMainWindow):
     <h2>Button Features and Usage</h2>
     <h3>File Menu</h3>
     <ul>
-        <li><strong>Open CSV File</strong>: Click this button to select and open a CSV file from your file system.</li>
-        <li><strong>Use Quotes</strong>: Toggle this option to open the CSV file with quotes around each field.</li>
-        <li><strong>Save CSV File</strong>: Save the current data (including any modifications) to a new CSV file.</li>
+        <li><strong>Open CSV File</strong>: Click this button to select and open a CSV file from your file system. Comma, semicolon, tab and pipe separated files open directly, as do gzip, bz2, xz and zstd compressed ones; the delimiter, quoting, header and encoding are detected from the start of the file and remembered for the next time.</li>
+        <li><strong>Open Large File (Memory-Mapped)</strong>: Browse files larger than memory. Rows are read from disk only as you scroll; the file opens read-only.</li>
+        <li><strong>Use Sidecar Cache</strong>: Keep a fast binary copy of large files after their first load, so opening them again is instant.</li>
+        <li><strong>Follow File</strong>: Keep watching the open file and add rows as they are appended to it, like tail -f. If the file is truncated or replaced it is reloaded.</li>
+        <li><strong>Manage Cache</strong>: See which files are cached and how much disk space they use, or clear the cache.</li>
+        <li><strong>Use Quotes</strong>: Toggle this option to show quotes around each field. Files saved while it is on have every field quoted.</li>
+        <li><strong>Save Filtered Rows Only</strong>: Off by default, so saving writes every row in the current sort order. Turn it on to save only the rows that pass the filter bar.</li>
+        <li><strong>Compact Memory on Load</strong>: Store repetitive text as categories and numbers in the narrowest type that holds them exactly. Large files take much less memory.</li>
+        <li><strong>Stream Large Files</strong>: Show rows while the file is still loading. The progress bar shows how much of the file has been read.</li>
+        <li><strong>Save CSV File</strong>: Save the current data (including any modifications) to a new CSV file. Saving runs in the background and can be cancelled; the target file is only replaced once the new one is complete. Names ending in .gz, .bz2, .xz or .zst are compressed.</li>
     </ul>
 
     <h3>Navigation Buttons</h3>
@@ -451,11 +1675,17 @@ class CSVReaderApp(QMainWindow):
 
     <h3>Edit Menu</h3>
     <ul>
+        <li><strong>Filter bar</strong>: Type above the table to show only matching rows. Pick a column or search all of them, and choose contains, equals, regex or between (for example 10..20). The search runs in the background, so typing never waits for it.</li>
+        <li><strong>Undo / Redo</strong>: Step backwards and forwards through your cell edits (Ctrl+Z / Ctrl+Y).</li>
         <li><strong>Go to...</strong>: Open a dialog box to enter a row index and jump directly to the specified row.</li>
-        <li><strong>Sort</strong>: Open a dialog box to sort the data based on a selected column and order (ascending or descending).</li>
-        <li><strong>Describe Data</strong>: Display a dialog box with a summary of descriptive statistics for the loaded data.</li>
+        <li><strong>Sort</strong>: Open a dialog box to sort the data by up to three columns, each ascending or descending. Rows with equal keys keep their file order.</li>
+        <li><strong>Reset Sort</strong>: Show the rows in file order again.</li>
+        <li><strong>Describe Data</strong>: Display descriptive statistics for every column, including text columns. Statistics are computed in the background and kept up to date as you edit; on very large files quantiles and distinct counts are estimates (marked ~).</li>
         <li><strong>Get Column Names</strong>: Display a dialog box listing all column names in the loaded data.</li>
         <li><strong>Get Row Count</strong>: Display a dialog box showing the total number of rows in the loaded data.</li>
+        <li><strong>Memory Report</strong>: Show how much memory each column uses next to an estimate for a default load of the same file.</li>
+        <li><strong>Group By / Pivot</strong>: Count the rows per key, or the sum, mean, min and max of value columns, for the rows as shown (sort, filter and edits included). Pick a pivot column to get one result column per value. Runs in the background; the result can be saved as CSV.</li>
+        <li><strong>Compare with File</strong>: Match the rows of another CSV file (old) to the open file as saved (new) on one or two key columns, and list the rows removed, added and changed. Changed cells read "old → new". Both files are streamed, so files larger than memory can be compared.</li>
     </ul>
 
     <h3>Extra edit feature</h3>
@@ -468,6 +1698,9 @@ class CSVReaderApp(QMainWindow):
     <h3>Help Button</h3>
     <ul>
         <li><strong>Help</strong>: Open a dialog box displaying this help documentation.</li>
+        <li><strong>Performance Overlay</strong>: Show timings of the last load, sort, filter, describe and save, how many cells the last repaint asked for, and memory use in the status bar.</li>
+        <li><strong>Export Trace</strong>: Save what the overlay recorded as a trace file that opens in chrome://tracing or Perfetto, to attach to a "Merry is slow" report.</li>
+        <li><strong>Profile with cProfile</strong>: Run the chosen operations under the Python profiler; the status bar shows where each .prof file was saved.</li>
     </ul>
 
     <h2>Feel free to donate the creator's effort</h2>
@@ -501,17 +1734,24 @@ class CSVReaderApp(QMainWindow):
         dialog.exec()
 
     def closeEvent(self, event):
-        self.threadpool.clear()
+        # Running parses stop at their next checkpoint instead of outliving the window
+        self.stop_follow()
+        self.jobs.shutdown()
         event.accept()
 
-async def main():
+def main():
     app = QApplication(sys.argv)
     app.setWindowIcon(QIcon("ic2.png"))  # Replace with your icon file path
     window = CSVReaderApp()
     window.show()
-    window.show_help_dialog()
-    await app.exec()
+    QTimer.singleShot(0, window.show_help_dialog)  # After the window has painted
+    return app.exec()
 
 if __name__ == "__main__":
-    multiprocessing.freeze_support()
-    asyncio.run(main())
\ No newline at end of file
+    if sys.argv[1:2] and sys.argv[1] in COMMANDS:
+        # merry stats|sort|convert|head run headless, without Qt
+        sys.exit(cli_main(sys.argv[1:]))
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+    sys.exit(main())
\ No newline at end of file
@@ -0,0 +1,2157 @@
+import sys
+import os
+import importlib
+import io
+import csv
+import codecs
+import mmap
+import tempfile
+import hashlib
+import pickle
+import shutil
+import time
+import warnings
+import json
+import argparse
+import itertools
+import threading
+import contextlib
+import importlib.util
+from collections import OrderedDict, deque
+
+class LazyModule:
+    # Stands in for pandas and NumPy until first used, so the window can paint
+    # before they are imported. The first attribute access imports the module
+    # and rebinds the name in the namespace holding it, so later lookups cost
+    # nothing extra.
+    def __init__(self, name, alias, namespace):
+        self._name = name
+        self._alias = alias
+        self._namespace = namespace
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        self._namespace[self._alias] = module
+        return getattr(module, attr)
+
+pd = LazyModule("pandas", "pd", globals())
+np = LazyModule("numpy", "np", globals())
+
+class BlockRenderer:
+    # Formats cells a block of rows at a time from the underlying NumPy column
+    # arrays and keeps the formatted strings in a bounded LRU cache, so a repaint
+    # never has to go through DataFrame.iloc for each visible cell.
+    def __init__(self, data, block_size=256, max_blocks=1024, quoted=False, edits=None):
+        self._data = data
+        self.edits = edits
+        self.quoted = quoted
+        self.order = None  # View row -> data row permutation, None for file order
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self._columns = {}
+        self._blocks = OrderedDict()
+
+    def column_array(self, col):
+        # NumPy numbers and objects are read straight from the column's array.
+        # Other types (pandas strings, categoricals, Arrow, datetimes) stay a
+        # Series, so only the rows of a block are converted and formatted.
+        values = self._columns.get(col)
+        if values is None:
+            series = self._data.iloc[:, col]
+            numpy_backed = isinstance(series.dtype, np.dtype) and series.dtype.kind in "iufbO"
+            values = series.to_numpy() if numpy_backed else series
+            self._columns[col] = values
+        return values
+
+    def text(self, row, col):
+        key = (row // self.block_size, col)
+        block = self._blocks.get(key)
+        if block is None:
+            block = self._render_block(*key)
+            self._blocks[key] = block
+            if len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(key)
+        return block[row % self.block_size]
+
+    def _render_block(self, block, col):
+        start = block * self.block_size
+        rows = slice(start, start + self.block_size) if self.order is None else self.order[start:start + self.block_size]
+        values = self.column_array(col)
+        if isinstance(values, pd.Series):
+            # Formatted through str() to match what the cell would show from iloc
+            texts = values.iloc[rows].to_numpy(dtype=object).astype(str).tolist()
+        else:
+            texts = values[rows].astype(str).tolist()
+        edits = self.edits.column_edits(col) if self.edits is not None else None
+        if edits:
+            positions = range(start, start + len(texts)) if self.order is None else self.order[start:start + len(texts)]
+            for i, position in enumerate(positions):
+                if position in edits:
+                    texts[i] = str(edits[position])
+        if self.quoted:
+            texts = np.char.add(np.char.add('"', np.array(texts, dtype=str)), '"').tolist()
+        return texts
+
+    def set_order(self, order):
+        self.order = order
+        self._blocks.clear()
+
+    def extend(self, data, order, shown):
+        # Rows were appended to the data and the first shown view rows kept
+        # their place, so only the block that held the old last row goes stale.
+        # Column arrays are cheap views and are taken again from the new frame.
+        self._data = data
+        self.order = order
+        self._columns.clear()
+        for key in [key for key in self._blocks if key[0] >= shown // self.block_size]:
+            del self._blocks[key]
+
+    def invalidate(self, row=None, col=None):
+        # The base columns never change, so only formatted blocks go stale
+        if row is None and col is None:
+            self._blocks.clear()
+            return
+        if row is None:
+            stale = [key for key in self._blocks if key[1] == col]
+        else:
+            stale = [(row // self.block_size, col)]
+        for key in stale:
+            self._blocks.pop(key, None)
+
+COMPRESSION_MAGIC = [(b"\x1f\x8b", "gzip"), (b"BZh", "bz2"), (b"\xfd7zXZ\x00", "xz"), (b"\x28\xb5\x2f\xfd", "zstd")]
+DELIMITERS = {",": "comma", ";": "semicolon", "\t": "tab", "|": "pipe"}
+
+class CSVDialect:
+    # How a file is laid out: compression, text encoding, delimiter, quote
+    # character and whether the first line is a header
+    def __init__(self, delimiter=",", quotechar='"', header=True, encoding="utf-8", compression=None):
+        self.delimiter = delimiter
+        self.quotechar = quotechar
+        self.header = header
+        self.encoding = encoding
+        self.compression = compression
+
+    def as_dict(self):
+        return {"delimiter": self.delimiter, "quotechar": self.quotechar, "header": self.header,
+                "encoding": self.encoding, "compression": self.compression}
+
+    def read_args(self):
+        # Keyword arguments for pd.read_csv on the decompressed stream
+        return {"sep": self.delimiter, "quotechar": self.quotechar, "header": 0 if self.header else None,
+                "encoding": self.encoding}
+
+    def byte_records(self):
+        # Records can be found by scanning raw bytes for newlines and quotes,
+        # as the parallel, memory-mapped and follow paths do. A UTF-8 BOM only
+        # sits at offset 0, ahead of the first record, so it doesn't get in the way.
+        encoding = "utf-8" if codecs.lookup(self.encoding).name == "utf-8-sig" else self.encoding
+        return (self.compression is None and "\n".encode(encoding) == b"\n" and
+                self.quotechar.encode(encoding) == self.quotechar.encode("ascii"))
+
+    def quote_byte(self):
+        return ord(self.quotechar)
+
+    def describe(self):
+        parts = [f"{DELIMITERS.get(self.delimiter, repr(self.delimiter))} separated", self.encoding]
+        if self.quotechar != '"':
+            parts.append(f"{self.quotechar} quoted")
+        if not self.header:
+            parts.append("no header")
+        if self.compression:
+            parts.append(self.compression)
+        return ", ".join(parts)
+
+def decompressor_for(compression):
+    # Wraps a binary file in a streaming decompressor, the reading side of
+    # compressor_for
+    if compression == "gzip":
+        import gzip
+        return lambda raw: gzip.GzipFile(fileobj=raw, mode="rb")
+    if compression == "bz2":
+        import bz2
+        return lambda raw: bz2.BZ2File(raw, "rb")
+    if compression == "xz":
+        import lzma
+        return lambda raw: lzma.LZMAFile(raw, "rb")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Reading .zst files needs the zstandard package.")
+        return lambda raw: io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=False))
+    raise ValueError(f"Unknown compression {compression!r}.")
+
+def detect_compression(head):
+    return next((name for magic, name in COMPRESSION_MAGIC if head.startswith(magic)), None)
+
+def decompress_head(head, compression):
+    # Decompresses as much of a truncated compressed prefix as it can; bz2
+    # gives nothing until a whole block (up to 900 KB) is in
+    if compression == "gzip":
+        import zlib
+        return zlib.decompressobj(wbits=31).decompress(head)
+    if compression == "bz2":
+        import bz2
+        return bz2.BZ2Decompressor().decompress(head)
+    if compression == "xz":
+        import lzma
+        return lzma.LZMADecompressor().decompress(head)
+    try:
+        import zstandard
+    except ImportError:
+        return b""  # Sniffed as plain text; reading the file reports the missing package
+    return zstandard.ZstdDecompressor().decompressobj().decompress(head)
+
+@contextlib.contextmanager
+def open_input(file_path, compression=None):
+    # Yields the stream to parse, decompressed on the fly, and the file under
+    # it, whose position tracks progress. "-" reads stdin.
+    raw = sys.stdin.buffer if file_path == "-" else open(file_path, "rb")
+    try:
+        yield (decompressor_for(compression)(raw) if compression else raw), raw
+    finally:
+        if raw is not sys.stdin.buffer:
+            raw.close()
+
+def sniff_encoding(sample):
+    if sample.startswith(codecs.BOM_UTF8):
+        return "utf-8-sig"
+    if sample.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return "utf-16"
+    if sample[1::2].count(0) > len(sample) // 4:
+        return "utf-16-le"  # ASCII text without a byte order mark
+    if sample[0::2].count(0) > len(sample) // 4:
+        return "utf-16-be"
+    try:
+        # Incremental, so a character cut off at the end of the sample is fine
+        codecs.getincrementaldecoder("utf-8")().decode(sample)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+def sniff_dialect(sample, compression=None, max_lines=200):
+    # Works out the dialect from the first (decompressed) bytes of a file.
+    # Every delimiter and quote character pair parses the sample; the pair
+    # giving the most rows with the same number of fields wins, then the one
+    # with more fields.
+    encoding = sniff_encoding(sample)
+    text = codecs.getincrementaldecoder(encoding)(errors="replace").decode(sample)
+    lines = text.splitlines(keepends=True)
+    if len(lines) > 1 and not lines[-1].endswith(("\n", "\r")):
+        lines.pop()  # Cut off by the sample
+    lines = lines[:max_lines]
+    best, best_score, best_rows = (",", '"'), None, []
+    for quotechar in "\"'":
+        for delimiter in DELIMITERS:
+            rows = [row for row in csv.reader(lines, delimiter=delimiter, quotechar=quotechar) if row]
+            if not rows:
+                continue
+            widths = [len(row) for row in rows]
+            width = max(set(widths), key=lambda value: (widths.count(value), value))
+            score = (width > 1, widths.count(width) / len(widths), width)
+            if best_score is None or score > best_score:
+                best, best_score, best_rows = (delimiter, quotechar), score, rows
+    return CSVDialect(best[0], best[1], sniff_header(best_rows), encoding, compression)
+
+def is_number(value):
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def sniff_header(rows):
+    # Columns whose values below the first row are all numbers vote: a
+    # number on the first row too means it is data, text means a header.
+    # Without such columns the first row is taken as a header.
+    votes = 0
+    for col, first in enumerate(rows[0] if rows else []):
+        body = [row[col] for row in rows[1:] if col < len(row) and row[col]]
+        if body and all(map(is_number, body)) and first:
+            votes += -1 if is_number(first) else 1
+    return votes >= 0
+
+INDEX_MAGIC = int.from_bytes(b"MERRYIDX", "little")
+INDEX_HEADER = 3  # magic, file size, mtime_ns
+
+def row_index_path(file_path):
+    return file_path + ".merryidx"
+
+def iter_record_starts(mm, size, block_size=1 << 24, quote=34):
+    # Scans the mapped file block by block and yields (bytes scanned, offsets
+    # where a new record starts). Newlines inside quoted fields are skipped by
+    # tracking quote parity across blocks.
+    in_quotes = False
+    pos = 0
+    while pos < size:
+        count = min(block_size, size - pos)
+        buf = np.frombuffer(mm, dtype=np.uint8, count=count, offset=pos)
+        newlines = np.flatnonzero(buf == 10)
+        quotes = buf == quote
+        if in_quotes or quotes.any():
+            # A uint8 cumsum wraps at 256, which keeps the parity intact
+            parity = (np.cumsum(quotes, dtype=np.uint8) & 1).astype(bool)
+            newlines = newlines[parity[newlines] == in_quotes]
+            in_quotes ^= bool(parity[-1])
+        del buf
+        pos += count
+        yield pos, (newlines + (pos - count + 1)).astype(np.uint64)
+
+def build_row_index(file_path, index_path, progress=None, block_size=1 << 24, quote=34):
+    # One pass over the mapped file collecting the byte offset where each data
+    # row starts. Offsets are streamed to disk so the scan itself stays small.
+    stat = os.stat(file_path)
+    size = stat.st_size
+    tmp_path = index_path + ".tmp"
+    try:
+        with open(file_path, "rb") as handle, open(tmp_path, "wb") as out:
+            np.array([INDEX_MAGIC, size, stat.st_mtime_ns], dtype=np.uint64).tofile(out)
+            mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                last = None
+                for pos, starts in iter_record_starts(mm, size, block_size, quote):
+                    if len(starts):
+                        out.write(starts.tobytes())
+                        last = int(starts[-1])
+                    if progress is not None:
+                        progress(pos * 1000 // size)
+                if last is None:
+                    raise ValueError("The file has a header but no data rows.")
+                if last != size:
+                    np.array([size], dtype=np.uint64).tofile(out)
+            finally:
+                mm.close()
+    except BaseException:
+        # Cancelled or failed part way: leave no half-written index behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, index_path)
+
+def split_records(file_path, targets, quote=34):
+    # Moves each target byte offset forward to the next record start, giving
+    # byte ranges that never cut a row (or a quoted newline) in half.
+    size = os.path.getsize(file_path)
+    targets = np.asarray(sorted(targets), dtype=np.uint64)
+    bounds = np.full(len(targets), size, dtype=np.uint64)
+    found = 0
+    with open(file_path, "rb") as handle:
+        mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            for pos, starts in iter_record_starts(mm, size, quote=quote):
+                while found < len(targets) and len(starts):
+                    at = np.searchsorted(starts, targets[found])
+                    if at == len(starts):
+                        break
+                    bounds[found] = starts[at]
+                    found += 1
+                if found == len(targets):
+                    break
+        finally:
+            mm.close()
+    return [int(bound) for bound in bounds]
+
+def parse_byte_range(file_path, start, stop, columns, dtypes, compact=False, read_args=None):
+    # Runs in a worker process; a range holds whole records and no header
+    with open(file_path, "rb") as handle:
+        handle.seek(start)
+        raw = handle.read(stop - start)
+    return parse_records(raw, columns, dtypes, compact, read_args)
+
+def parse_records(raw, columns, dtypes, compact=False, read_args=None):
+    read_args = dict(read_args or {}, header=None, names=columns)
+    try:
+        data = pd.read_csv(io.BytesIO(raw), dtype=dtypes, **read_args)
+    except ValueError:
+        # A float column from the sample holds text further down; keep only
+        # the text columns pinned and let pandas infer the rest
+        text_dtypes = {col: dtype for col, dtype in dtypes.items()
+                       if not isinstance(dtype, np.dtype) or dtype.kind not in "iufb"}
+        data = pd.read_csv(io.BytesIO(raw), dtype=text_dtypes, **read_args)
+    return compact_frame(data) if compact else data
+
+def infer_text_dtypes(sample, max_unique_ratio=0.5):
+    # read_csv dtype map for the text columns of a sample: repetitive text
+    # becomes categorical, other text Arrow-backed strings when pyarrow is there
+    arrow = importlib.util.find_spec("pyarrow") is not None
+    dtypes = {}
+    for name, series in sample.items():
+        if series.dtype.kind != "O":
+            continue
+        values = series.dropna()
+        if len(values) and values.nunique() <= max_unique_ratio * len(values):
+            dtypes[name] = "category"
+        elif arrow:
+            dtypes[name] = "string[pyarrow]"
+    return dtypes
+
+def compact_frame(frame):
+    # Downcasts numeric columns in place to the narrowest dtype that holds
+    # every value exactly. This runs on parsed values; read_csv itself would
+    # silently wrap integers that overflow a narrow dtype.
+    for position in range(frame.shape[1]):
+        series = frame.iloc[:, position]
+        kind = series.dtype.kind if isinstance(series.dtype, np.dtype) else "O"
+        if kind == "i":
+            frame.isetitem(position, pd.to_numeric(series, downcast="integer"))
+        elif kind == "f" and series.dtype.itemsize > 4:
+            narrow = series.astype(np.float32)
+            if ((narrow.astype(series.dtype) == series) | series.isna()).all():
+                frame.isetitem(position, narrow)
+    return frame
+
+def read_csv_compact(file_path, sample_rows=10000, **read_args):
+    sample = pd.read_csv(file_path, nrows=sample_rows, **read_args)
+    return compact_frame(pd.read_csv(file_path, dtype=infer_text_dtypes(sample), **read_args))
+
+def concat_frames(frames):
+    # pd.concat that keeps categorical columns categorical when the pieces
+    # were parsed with different categories
+    from pandas.api.types import union_categoricals
+    frames = list(frames)
+    if len(frames) > 1:
+        for position, dtype in enumerate(frames[0].dtypes):
+            if not isinstance(dtype, pd.CategoricalDtype):
+                continue
+            pieces = [frame.iloc[:, position] for frame in frames]
+            if not all(isinstance(piece.dtype, pd.CategoricalDtype) for piece in pieces):
+                continue
+            categories = union_categoricals(pieces, sort_categories=True).categories
+            for number, frame in enumerate(frames):
+                frames[number] = frame = frame.copy(deep=False)
+                frame.isetitem(position, frame.iloc[:, position].cat.set_categories(categories))
+    return pd.concat(frames, ignore_index=True)
+
+def memory_report(data, file_path=None, sample_rows=10000):
+    # Bytes per column now, next to an estimate of what a default read_csv of
+    # the same file would take (scaled up from a sample)
+    rows = []
+    default = None
+    if file_path is not None and os.path.isfile(file_path):
+        sample = CSVLoader(file_path).head(sample_rows)
+        if len(sample):
+            default = sample.memory_usage(index=False, deep=True) / len(sample) * len(data)
+    usage = data.memory_usage(index=False, deep=True)
+    for position, name in enumerate(data.columns):
+        before = default.iloc[position] if default is not None and position < len(default) else np.nan
+        rows.append((str(name), str(data.dtypes.iloc[position]), before, usage.iloc[position]))
+    report = pd.DataFrame(rows, columns=["column", "dtype", "default bytes (est.)", "bytes"])
+    report.loc[len(report)] = ["TOTAL", "", report["default bytes (est.)"].sum(min_count=1), report["bytes"].sum()]
+    return report
+
+def load_row_index(file_path, index_path):
+    # Returns the memory-mapped offsets, or None when the index is missing or stale
+    try:
+        header = np.fromfile(index_path, dtype=np.uint64, count=INDEX_HEADER)
+    except OSError:
+        return None
+    stat = os.stat(file_path)
+    if len(header) < INDEX_HEADER or list(header) != [INDEX_MAGIC, stat.st_size, stat.st_mtime_ns]:
+        return None
+    return np.memmap(index_path, dtype=np.uint64, mode="r", offset=INDEX_HEADER * 8)
+
+class MappedCSV:
+    # Out-of-core data source: the file stays memory-mapped and only the row
+    # blocks the view asks for are decoded and parsed, so resident memory
+    # follows the viewport instead of the file size.
+    def __init__(self, file_path, offsets, block_size=256, max_blocks=64, dialect=None):
+        self.file_path = file_path
+        self.quoted = False
+        self.offsets = offsets
+        self.block_size = block_size
+        self.max_blocks = max_blocks
+        self.dialect = dialect or CSVDialect()
+        # The index holds the starts of the records after the first line;
+        # without a header the first line is row 0
+        self.lead = 0 if self.dialect.header else 1
+        self._handle = open(file_path, "rb")
+        self._mm = mmap.mmap(self._handle.fileno(), 0, access=mmap.ACCESS_READ)
+        first = self.parse(self._mm[:int(offsets[0])])
+        self.columns = first[0] if first and self.dialect.header else list(range(len(first[0]) if first else 0))
+        self._blocks = OrderedDict()
+
+    @classmethod
+    def open(cls, file_path, progress=None):
+        dialect = dialect_for(file_path)
+        if not dialect.byte_records():
+            raise ValueError(f"Memory-mapped opening needs an uncompressed UTF-8 or single-byte file ({dialect.describe()}).")
+        index_path = row_index_path(file_path)
+        offsets = load_row_index(file_path, index_path)
+        if offsets is None:
+            try:
+                build_row_index(file_path, index_path, progress, quote=dialect.quote_byte())
+            except OSError:
+                # Read-only folder: keep the index in the temp directory instead
+                index_path = os.path.join(tempfile.gettempdir(), os.path.basename(index_path))
+                offsets = load_row_index(file_path, index_path)
+                if offsets is None:
+                    build_row_index(file_path, index_path, progress, quote=dialect.quote_byte())
+            if offsets is None:
+                offsets = load_row_index(file_path, index_path)
+        return cls(file_path, offsets, dialect=dialect)
+
+    @property
+    def shape(self):
+        return (len(self), len(self.columns))
+
+    def __len__(self):
+        return len(self.offsets) - 1 + self.lead
+
+    def offset(self, row):
+        return 0 if row < self.lead else int(self.offsets[row - self.lead])
+
+    def parse(self, raw):
+        text = io.StringIO(raw.decode(self.dialect.encoding, errors="replace"))
+        return list(csv.reader(text, delimiter=self.dialect.delimiter, quotechar=self.dialect.quotechar))
+
+    def rows(self, start, stop):
+        return self.parse(self._mm[self.offset(start):self.offset(stop)])
+
+    def text(self, row, col):
+        block = row // self.block_size
+        rows = self._blocks.get(block)
+        if rows is None:
+            start = block * self.block_size
+            rows = self.rows(start, min(start + self.block_size, len(self)))
+            self._blocks[block] = rows
+            if len(self._blocks) > self.max_blocks:
+                self._blocks.popitem(last=False)
+        else:
+            self._blocks.move_to_end(block)
+        values = rows[row % self.block_size] if row % self.block_size < len(rows) else []
+        text = values[col] if col < len(values) else ""
+        return f'"{text}"' if self.quoted else text
+
+    def set_order(self, order):
+        if order is not None:
+            raise ValueError("Memory-mapped files can't be sorted.")
+
+    def invalidate(self, row=None, col=None):
+        self._blocks.clear()
+
+    def close(self):
+        self._blocks.clear()
+        self._mm.close()
+        self._handle.close()
+
+class FileReset(Exception):
+    pass
+
+class TailReader:
+    # Follows a CSV that is being appended to. Each poll parses only the
+    # complete records written since the last one; a shrinking or replaced
+    # file raises FileReset so the caller can reload it from scratch.
+    max_bytes = 64 * 1024 * 1024  # Per poll, so a burst is taken in slices
+
+    def __init__(self, file_path, data, compact=False):
+        self.file_path = file_path
+        self.rows = data.shape[0]  # Records already loaded, to locate the start offset
+        self.columns = list(data.columns)
+        # Pin text and float columns to what was loaded so appended batches
+        # concatenate cleanly. Integers are left to inference (narrow integer
+        # dtypes would wrap) and categoricals take whatever values turn up.
+        self.dtypes = {}
+        for col, dtype in data.dtypes.items():
+            if isinstance(dtype, pd.CategoricalDtype):
+                self.dtypes[col] = "category"
+            elif not isinstance(dtype, np.dtype):
+                self.dtypes[col] = dtype
+            elif dtype.kind == "f":
+                self.dtypes[col] = np.float64  # Compact loads narrow it again when exact
+        self.compact = compact
+        self.dialect = None
+        self.offset = None
+        self.identity = None
+
+    def locate(self):
+        self.dialect = dialect_for(self.file_path)
+        if not self.dialect.byte_records():
+            raise ValueError(f"Follow mode needs an uncompressed UTF-8 or single-byte file ({self.dialect.describe()}).")
+        stat = os.stat(self.file_path)
+        self.identity = (stat.st_dev, stat.st_ino)
+        self.offset = stat.st_size
+        if stat.st_size == 0:
+            raise FileReset(self.file_path)
+        # Record starts follow each line; without a header row 0 starts at 0
+        skip = self.rows - (0 if self.dialect.header else 1)
+        if skip < 0:
+            self.offset = 0
+            return
+        seen = 0
+        with open(self.file_path, "rb") as handle:
+            mm = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+            try:
+                for _, starts in iter_record_starts(mm, stat.st_size, quote=self.dialect.quote_byte()):
+                    if seen + len(starts) > skip:
+                        self.offset = int(starts[skip - seen])
+                        return
+                    seen += len(starts)
+            finally:
+                mm.close()
+        if seen < skip:
+            # Fewer records than were loaded: the file was rewritten
+            raise FileReset(self.file_path)
+
+    def poll(self):
+        if self.offset is None:
+            self.locate()
+        stat = os.stat(self.file_path)
+        if (stat.st_dev, stat.st_ino) != self.identity or stat.st_size < self.offset:
+            raise FileReset(self.file_path)
+        if stat.st_size == self.offset:
+            return None
+        with open(self.file_path, "rb") as handle:
+            handle.seek(self.offset)
+            raw = handle.read(min(stat.st_size - self.offset, self.max_bytes))
+        # Cut after the last newline outside quotes; a half-written record
+        # stays on disk until the next poll
+        buf = np.frombuffer(raw, dtype=np.uint8)
+        newlines = np.flatnonzero(buf == 10)
+        quotes = buf == self.dialect.quote_byte()
+        if quotes.any():
+            parity = (np.cumsum(quotes, dtype=np.uint8) & 1).astype(bool)
+            newlines = newlines[~parity[newlines]]
+        if not len(newlines):
+            return None
+        end = int(newlines[-1]) + 1
+        data = parse_records(raw[:end], self.columns, self.dtypes, self.compact, self.dialect.read_args())
+        self.offset += end
+        self.rows += len(data)
+        return data
+
+    def pending(self):
+        # True when the last poll was cut short by max_bytes
+        return self.offset is not None and os.path.getsize(self.file_path) - self.offset > self.max_bytes
+
+def default_cache_dir():
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA")
+    if not base:
+        base = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "merry")
+
+class SidecarCache:
+    # Columnar copy of parsed files, one directory per file version. NumPy
+    # columns are saved as .npy and memory-mapped copy-on-write when loaded, so
+    # a re-open costs no parsing and edits never reach the cached files. Other
+    # columns (text, extension types) are pickled together.
+    def __init__(self, directory=None, max_bytes=4 * 1024 ** 3, min_file_bytes=16 * 1024 ** 2):
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = max_bytes
+        self.min_file_bytes = min_file_bytes  # Smaller files parse faster than they load
+
+    def key(self, file_path, variant=""):
+        # variant keeps differently parsed copies of one file apart
+        stat = os.stat(file_path)
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(f"{os.path.abspath(file_path)}|{stat.st_size}|{stat.st_mtime_ns}|{variant}".encode())
+        # Sampled content hash: catches rewrites that keep size and mtime
+        # without reading the whole file
+        with open(file_path, "rb") as handle:
+            for offset in np.linspace(0, max(stat.st_size - 65536, 0), 16).astype(np.int64):
+                handle.seek(int(offset))
+                digest.update(handle.read(65536))
+        return digest.hexdigest()
+
+    def wants(self, file_path):
+        return os.path.getsize(file_path) >= self.min_file_bytes
+
+    def load(self, file_path, variant=""):
+        entry = os.path.join(self.directory, self.key(file_path, variant))
+        try:
+            with open(os.path.join(entry, "meta.pkl"), "rb") as handle:
+                meta = pickle.load(handle)
+            others = pd.read_pickle(os.path.join(entry, "others.pkl")) if meta["others"] else None
+            columns = {}
+            for position, name in enumerate(meta["columns"]):
+                if position in meta["arrays"]:
+                    # A plain ndarray view keeps the mapping alive without the memmap subclass
+                    columns[position] = np.load(os.path.join(entry, f"col_{position}.npy"), mmap_mode="c").view(np.ndarray)
+                else:
+                    columns[position] = others.iloc[:, meta["others"].index(position)]
+        except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+            return None
+        os.utime(os.path.join(entry, "meta.pkl"))  # Last-used time drives eviction
+        frame = pd.DataFrame(columns, copy=False)
+        frame.columns = meta["columns"]
+        return frame
+
+    def store(self, file_path, frame, variant=""):
+        os.makedirs(self.directory, exist_ok=True)
+        entry = os.path.join(self.directory, self.key(file_path, variant))
+        tmp_entry = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        try:
+            arrays, others = [], []
+            for position in range(frame.shape[1]):
+                series = frame.iloc[:, position]
+                if isinstance(series.dtype, np.dtype) and series.dtype.kind in "iufbmM":
+                    np.save(os.path.join(tmp_entry, f"col_{position}.npy"), series.to_numpy())
+                    arrays.append(position)
+                else:
+                    others.append(position)
+            if others:
+                frame.iloc[:, others].to_pickle(os.path.join(tmp_entry, "others.pkl"))
+            meta = {"file_path": os.path.abspath(file_path), "columns": list(frame.columns),
+                    "rows": len(frame), "arrays": arrays, "others": others}
+            with open(os.path.join(tmp_entry, "meta.pkl"), "wb") as handle:
+                pickle.dump(meta, handle)
+            shutil.rmtree(entry, ignore_errors=True)
+            os.replace(tmp_entry, entry)
+        except Exception:
+            shutil.rmtree(tmp_entry, ignore_errors=True)
+            raise
+        self.evict()
+
+    def entries(self):
+        # (entry directory, source file, bytes, last used) for every cached file
+        found = []
+        if not os.path.isdir(self.directory):
+            return found
+        for name in os.listdir(self.directory):
+            entry = os.path.join(self.directory, name)
+            meta_path = os.path.join(entry, "meta.pkl")
+            if name.startswith(".") or not os.path.isfile(meta_path):
+                continue
+            try:
+                with open(meta_path, "rb") as handle:
+                    source = pickle.load(handle)["file_path"]
+                size = sum(os.path.getsize(os.path.join(entry, part)) for part in os.listdir(entry))
+                found.append((entry, source, size, os.path.getmtime(meta_path)))
+            except (OSError, EOFError, KeyError, pickle.UnpicklingError):
+                continue
+        return found
+
+    def evict(self):
+        entries = sorted(self.entries(), key=lambda entry: entry[3])
+        total = sum(entry[2] for entry in entries)
+        for entry, _, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+
+    def clear(self):
+        for entry, _, _, _ in self.entries():
+            shutil.rmtree(entry, ignore_errors=True)
+
+class DialectStore:
+    # Dialects sniffed before, by file path, so reopening a file skips the
+    # sniff. An entry is dropped when the file's first bytes change.
+    max_entries = 1000
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(default_cache_dir(), "dialects.json")
+        self._lock = threading.Lock()
+
+    def read(self):
+        try:
+            with open(self.path, encoding="utf-8") as handle:
+                return json.load(handle)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, file_path, head):
+        entry = self.read().get(os.path.abspath(file_path))
+        if entry is None or entry.get("head") != hashlib.blake2b(head, digest_size=16).hexdigest():
+            return None
+        return CSVDialect(**entry["dialect"])
+
+    def put(self, file_path, head, dialect):
+        with self._lock:
+            entries = self.read()
+            key = os.path.abspath(file_path)
+            entries.pop(key, None)
+            entries[key] = {"head": hashlib.blake2b(head, digest_size=16).hexdigest(), "dialect": dialect.as_dict()}
+            while len(entries) > self.max_entries:
+                entries.pop(next(iter(entries)))  # Oldest first
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                tmp_path = f"{self.path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as handle:
+                    json.dump(entries, handle)
+                os.replace(tmp_path, self.path)
+            except OSError:
+                pass  # Read-only cache folder: sniff again next time
+
+dialects = DialectStore()
+
+def dialect_for(file_path, store=None, head_bytes=4096, sample_bytes=65536):
+    # The remembered dialect when the file still starts the same, otherwise
+    # a fresh sniff of the first sample_bytes
+    if file_path == "-":
+        # Only what is buffered can be looked at without consuming it
+        head = sys.stdin.buffer.peek(sample_bytes)
+        compression = detect_compression(head)
+        return sniff_dialect(decompress_head(head, compression) if compression else head, compression)
+    store = store or dialects
+    with open(file_path, "rb") as handle:
+        head = handle.read(head_bytes)
+    dialect = store.get(file_path, head)
+    if dialect is None:
+        compression = detect_compression(head)
+        with open_input(file_path, compression) as (stream, _):
+            sample = stream.read(sample_bytes)
+        dialect = sniff_dialect(sample, compression)
+        store.put(file_path, head, dialect)
+    return dialect
+
+class EditOverlay:
+    # Sparse cell edits kept on top of the loaded data, column -> {row: value}
+    # keyed by data row. The base columns are never written to, so they keep
+    # their dtype and are never copied for a single edit. Every change goes
+    # through a journal for undo and redo.
+    def __init__(self):
+        self._cells = {}
+        self._undo = []
+        self._redo = []
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._cells.values())
+
+    @staticmethod
+    def parse(value, dtype):
+        # Typed text becomes a value of the column's type when it can be read as one
+        if not isinstance(value, str):
+            return value
+        kind = dtype.kind if isinstance(dtype, np.dtype) else "O"
+        if kind in "iuf":
+            if not value.strip():
+                return np.nan
+            for convert in ((int, float) if kind in "iu" else (float,)):
+                try:
+                    return convert(value)
+                except ValueError:
+                    pass
+        elif kind == "b" and value.strip().lower() in ("true", "false"):
+            return value.strip().lower() == "true"
+        return value
+
+    def column_edits(self, col):
+        return self._cells.get(col, {})
+
+    def snapshot(self):
+        # A copy of the current edits without the journal
+        copy = EditOverlay()
+        copy._cells = {col: dict(rows) for col, rows in self._cells.items()}
+        return copy
+
+    def get(self, row, col, default=None):
+        return self._cells.get(col, {}).get(row, default)
+
+    def has(self, row, col):
+        return row in self._cells.get(col, {})
+
+    def _put(self, row, col, state):
+        # state is (True, value) for an edit or (False, None) for the base value
+        edited, value = state
+        if edited:
+            self._cells.setdefault(col, {})[row] = value
+        else:
+            rows = self._cells.get(col, {})
+            rows.pop(row, None)
+            if not rows:
+                self._cells.pop(col, None)
+
+    def set(self, row, col, value):
+        before = (self.has(row, col), self.get(row, col))
+        self._put(row, col, (True, value))
+        self._undo.append((row, col, before, (True, value)))
+        self._redo.clear()
+
+    def undo(self):
+        # Returns the (row, col) that changed, or None when there is nothing to undo
+        if not self._undo:
+            return None
+        row, col, before, after = self._undo.pop()
+        self._put(row, col, before)
+        self._redo.append((row, col, before, after))
+        return row, col
+
+    def redo(self):
+        if not self._redo:
+            return None
+        row, col, before, after = self._redo.pop()
+        self._put(row, col, after)
+        self._undo.append((row, col, before, after))
+        return row, col
+
+    def column(self, data, col):
+        # The column with edits applied; the base column itself when unedited
+        series = data.iloc[:, col]
+        edits = self._cells.get(col)
+        if not edits:
+            return series
+        rows = np.fromiter(edits.keys(), dtype=np.intp, count=len(edits))
+        values = list(edits.values())
+        merged = series.copy()
+        try:
+            merged.iloc[rows] = values
+        except (TypeError, ValueError):
+            # Text typed into a numeric column: the merged copy holds objects
+            merged = series.astype(object)
+            merged.iloc[rows] = values
+        return merged
+
+    def merge(self, data, positions):
+        # Copies only the requested data rows and applies their edits, so a
+        # file can be written out chunk by chunk with the edits folded in
+        chunk = data.iloc[positions]
+        if not self._cells:
+            return chunk
+        lookup = pd.Index(positions)
+        for col, edits in self._cells.items():
+            rows = np.fromiter(edits.keys(), dtype=np.intp, count=len(edits))
+            at = lookup.get_indexer(rows)
+            found = at >= 0
+            if not found.any():
+                continue
+            values = chunk.iloc[:, col].to_numpy(dtype=object).copy()
+            values[at[found]] = [value for value, hit in zip(edits.values(), found) if hit]
+            chunk.isetitem(col, values)
+        return chunk
+
+def sort_key(data, position, edits):
+    # Text typed into a numeric column sorts as missing, after the numbers,
+    # the way ColumnStats counts it
+    series = edits.column(data, position).reset_index(drop=True)
+    if data.dtypes.iloc[position].kind in "iuf" and series.dtype == object:
+        series = pd.to_numeric(series, errors="coerce")
+    return series
+
+def sort_permutation(data, keys, edits=None):
+    # keys is a list of (column position, ascending). Only the key columns are
+    # sorted; the result is the row order to view the data through. The sort
+    # is stable, so ties keep file order.
+    edits = edits or EditOverlay()
+    frame = pd.DataFrame({level: sort_key(data, position, edits) for level, (position, _) in enumerate(keys)})
+    order = frame.sort_values(by=list(range(len(keys))), ascending=[ascending for _, ascending in keys],
+                              kind="stable", na_position="last").index.to_numpy()
+    return order.astype(np.int32) if len(order) < 2 ** 31 else order
+
+class JobCancelled(Exception):
+    pass
+
+class SaveCancelled(JobCancelled):
+    pass
+
+class Tracer:
+    # Timing spans, counters and memory samples for the performance overlay
+    # and Chrome trace export (chrome://tracing, Perfetto). While disabled,
+    # span() hands back one shared no-op context and nothing is recorded.
+    def __init__(self, max_events=200000):
+        self.enabled = False
+        self.events = deque(maxlen=max_events)
+        self.counts = {}
+        self.last = {}  # Span name -> seconds the most recent one took
+        self.origin = time.perf_counter()
+        self.profile_kinds = set()  # Job kinds to run under cProfile
+        self.profile_dir = tempfile.gettempdir()
+        self.last_profile = None
+        self._off = contextlib.nullcontext()
+
+    def span(self, name, **args):
+        if not self.enabled:
+            return self._off
+        return self._span(name, args)
+
+    @contextlib.contextmanager
+    def _span(self, name, args):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, start, time.perf_counter(), args)
+
+    def add(self, name, start, end, args=None):
+        self.last[name] = end - start
+        self.events.append({"name": name, "ph": "X", "ts": (start - self.origin) * 1e6, "dur": (end - start) * 1e6,
+                            "pid": os.getpid(), "tid": threading.get_ident(), "args": args or {}})
+
+    def count(self, name, n=1):
+        self.counts[name] = self.counts.get(name, 0) + n
+
+    def take_count(self, name):
+        # Returns the count so far and starts it again from zero
+        return self.counts.pop(name, 0)
+
+    def counter(self, name, **values):
+        if self.enabled:
+            self.events.append({"name": name, "ph": "C", "ts": (time.perf_counter() - self.origin) * 1e6,
+                                "pid": os.getpid(), "tid": threading.get_ident(), "args": values})
+
+    def memory(self):
+        # Resident set size in MB, recorded as a counter when tracing
+        rss = None
+        try:
+            with open("/proc/self/statm") as statm:
+                rss = int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+        except (OSError, ValueError, AttributeError):
+            try:
+                import resource
+                peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                rss = peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024  # Peak, not current
+            except ImportError:
+                pass
+        if rss is not None:
+            self.counter("memory", rss_mb=round(rss, 1))
+        return rss
+
+    @contextlib.contextmanager
+    def profiled(self, kind):
+        # Runs the block under cProfile when its kind was picked, saving a .prof file
+        if kind not in self.profile_kinds:
+            yield
+            return
+        import cProfile
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            yield  # Another profiler is already running
+            return
+        try:
+            yield
+        finally:
+            profile.disable()
+            path = os.path.join(self.profile_dir, f"merry-{kind}-{time.strftime('%Y%m%d-%H%M%S')}.prof")
+            profile.dump_stats(path)
+            self.last_profile = path
+
+    def export(self, file_path):
+        events = list(self.events)
+        names = {event["tid"] for event in events}
+        for number, tid in enumerate(sorted(names)):
+            events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": tid,
+                           "args": {"name": "main" if tid == threading.main_thread().ident else f"worker {number}"}})
+        with open(file_path, "w") as handle:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, handle)
+        return len(events)
+
+    def clear(self):
+        self.events.clear()
+        self.counts.clear()
+        self.last.clear()
+
+tracer = Tracer()
+
+class JobToken:
+    # Handed to each background job. Cancelling only sets a flag; the job
+    # stops at its next checkpoint, and the generation tells a result of a
+    # superseded job apart from the current one.
+    def __init__(self, kind=None, generation=0):
+        self.kind = kind
+        self.generation = generation
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+    def check(self):
+        if self.cancelled:
+            raise JobCancelled(self.kind)
+
+def iter_chunks(data, view, edits, chunk_rows=100000):
+    # The rows of data in view order (None for file order) with edits merged
+    # in, a chunk at a time; always at least one (maybe empty) chunk
+    rows = data.shape[0] if view is None else len(view)
+    for start in range(0, max(rows, 1), chunk_rows):
+        stop = min(start + chunk_rows, rows)
+        positions = np.arange(start, stop) if view is None else view[start:stop]
+        yield edits.merge(data, positions)
+
+def compressor_for(file_path):
+    # Wraps a binary file in a streaming compressor picked by extension
+    extension = os.path.splitext(file_path)[1].lower()
+    if extension == ".gz":
+        import gzip
+        return lambda raw: gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=6)
+    if extension == ".bz2":
+        import bz2
+        return lambda raw: bz2.BZ2File(raw, "wb")
+    if extension == ".xz":
+        import lzma
+        return lambda raw: lzma.LZMAFile(raw, "wb")
+    if extension == ".zst":
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("Saving .zst files needs the zstandard package.")
+        return lambda raw: zstandard.ZstdCompressor().stream_writer(raw, closefd=False)
+    return None
+
+def write_chunks(text, chunks, total_rows=0, quoting=csv.QUOTE_MINIMAL, progress=None, cancelled=None, header=True):
+    # Writes the chunks to an open text stream (a file or stdout), header first
+    written = 0
+    for number, chunk in enumerate(chunks):
+        if cancelled is not None and cancelled():
+            raise SaveCancelled()
+        chunk.to_csv(text, index=False, header=header and number == 0, quoting=quoting)
+        written += len(chunk)
+        if progress is not None:
+            progress(written * 1000 // max(total_rows, 1))
+    return written
+
+def write_csv(file_path, chunks, total_rows, quoting=csv.QUOTE_MINIMAL, progress=None, cancelled=None, header=True):
+    # Writes the chunks to a temporary file next to the target and renames it
+    # over the target only once everything is on disk, so a crash or a cancel
+    # never leaves a truncated file behind.
+    directory, name = os.path.split(os.path.abspath(file_path))
+    tmp_path = os.path.join(directory, f".{name}.{os.getpid()}.{int(time.time() * 1000)}.tmp")
+    compressor = compressor_for(file_path)
+    try:
+        with open(tmp_path, "xb") as raw:
+            stream = compressor(raw) if compressor else raw
+            text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+            written = write_chunks(text, chunks, total_rows, quoting, progress, cancelled, header)
+            text.flush()
+            text.detach()
+            if stream is not raw:
+                stream.close()  # Writes the compressed trailer, leaves raw open
+            raw.flush()
+            os.fsync(raw.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, tmp_path)
+        os.replace(tmp_path, file_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return written
+
+class FilterEngine:
+    # Vectorized column predicates that return the matching row positions in
+    # file order. Per-column indexes are built on first use: a value -> rows
+    # map for low-cardinality columns and a sorted index for numeric ranges.
+    # A substring search that extends the previous one only rescans the rows
+    # that matched before, and the text of high-cardinality columns is
+    # formatted once. Searches run on worker threads, so an engine keeps the
+    # edits it was made with; updated() gives one that sees later edits and
+    # extended() one over a frame with rows appended.
+    operators = ["contains", "equals", "regex", "between"]
+
+    def __init__(self, data, max_groups=65536, edits=None):
+        self._data = data
+        self.edits = EditOverlay() if edits is None else edits  # An empty overlay is falsy
+        self.max_groups = max_groups
+        self._groups = {}
+        self._sorted = {}
+        self._texts = {}
+        self._last = None  # (column, query, rows) of the last substring search
+
+    def updated(self, edits, columns):
+        # A copy that reads edits, keeping the indexes of all but columns
+        engine = FilterEngine(self._data, self.max_groups, edits)
+        for own, cache in ((self._groups, engine._groups), (self._sorted, engine._sorted),
+                           (self._texts, engine._texts)):
+            cache.update((col, value) for col, value in list(own.items()) if col not in columns)
+        return engine
+
+    def extended(self, data):
+        # A copy over data, this engine's frame with rows appended. Group codes
+        # and texts take in the new rows when next used, on the search thread;
+        # sorted indexes are built again.
+        engine = FilterEngine(data, self.max_groups, self.edits)
+        engine._groups.update(self._groups)
+        engine._texts.update(self._texts)
+        return engine
+
+    def values(self, col, start=0):
+        series = self.edits.column(self._data, col)
+        return (series.iloc[start:] if start else series).to_numpy()
+
+    def groups(self, col):
+        # (codes, uniques, value -> code) or None for high-cardinality columns
+        if col not in self._groups:
+            codes, uniques = pd.factorize(self.edits.column(self._data, col))
+            if len(uniques) > self.max_groups:
+                self._groups[col] = None
+            else:
+                lookup = {str(value): code for code, value in enumerate(uniques)}
+                self._groups[col] = (codes, pd.Index(uniques).astype(str), lookup)
+        elif self._groups[col] is not None and len(self._groups[col][0]) < self._data.shape[0]:
+            self._groups[col] = self.appended_groups(col, *self._groups[col])
+        return self._groups[col]
+
+    def appended_groups(self, col, codes, uniques, lookup):
+        # Codes for appended rows; values not seen before get new codes
+        new_codes, new_uniques = pd.factorize(self.values(col, len(codes)))
+        lookup = dict(lookup)
+        texts = [str(value) for value in new_uniques]
+        added = []
+        for text in texts:
+            if text not in lookup:
+                lookup[text] = len(uniques) + len(added)
+                added.append(text)
+        if len(uniques) + len(added) > self.max_groups:
+            return None
+        mapping = np.array([lookup[text] for text in texts], dtype=np.intp)
+        appended = np.full(len(new_codes), -1, dtype=np.intp)
+        found = new_codes >= 0
+        appended[found] = mapping[new_codes[found]]
+        return np.concatenate([codes, appended]), uniques.append(pd.Index(added, dtype=uniques.dtype)), lookup
+
+    def sorted_index(self, col):
+        if col not in self._sorted:
+            values = self.values(col)
+            order = np.argsort(values, kind="stable")  # NaN sorts last
+            self._sorted[col] = (order, values[order])
+        return self._sorted[col]
+
+    def texts(self, col):
+        texts = self._texts.get(col)
+        if texts is None:
+            texts = self._texts[col] = pd.Series(self.values(col)).astype(str)
+        elif len(texts) < self._data.shape[0]:
+            appended = pd.Series(self.values(col, len(texts))).astype(str)
+            texts = self._texts[col] = pd.concat([texts, appended], ignore_index=True)
+        return texts
+
+    def is_numeric(self, col):
+        return self.edits.column(self._data, col).dtype.kind in "iuf"  # Bools match as text: True, False
+
+    def number_rows(self, col, query, rows=None):
+        # Narrows a substring search of a numeric column without formatting
+        # it: no row when the query holds a character str() never writes for
+        # such numbers, and only inf, NaN and exponent forms when it holds a
+        # letter. rows comes back unchanged (None for all) when any row may match.
+        series = self.edits.column(self._data, col)
+        if series.dtype.kind not in "iuf":
+            return rows
+        values = series.to_numpy()
+        chars = set(query.lower())
+        if values.dtype.kind in "iu":
+            return rows if chars <= set("0123456789-") else np.empty(0, dtype=np.intp)
+        if values.dtype != np.float64:
+            return rows
+        if not chars <= set("0123456789.-+einfa"):
+            return np.empty(0, dtype=np.intp)
+        if not chars & set("einfa"):
+            return rows
+        values = values if rows is None else values[rows]
+        size = np.abs(values)
+        with np.errstate(invalid="ignore"):
+            mask = ~np.isfinite(values) | (size >= 1e16) | ((size < 1e-4) & (values != 0))
+        return np.flatnonzero(mask) if rows is None else rows[mask]
+
+    def text_mask(self, col, match, rows=None):
+        # Applies a string predicate to the cells' display text
+        groups = self.groups(col)
+        if groups is not None:
+            codes, uniques, _ = groups
+            # Code -1 (missing) picks up the trailing False
+            hits = np.append(np.asarray(match(pd.Series(uniques)), dtype=bool), False)
+            return hits[codes if rows is None else codes[rows]]
+        if rows is None or col in self._texts:
+            texts = self.texts(col)
+            texts = texts if rows is None else texts.iloc[rows]
+        else:
+            texts = pd.Series(self.values(col)[rows]).astype(str)  # Only the rows left to check
+        return np.asarray(match(texts), dtype=bool)
+
+    def column_rows(self, col, operator, query, rows=None):
+        if operator == "contains":
+            rows = self.number_rows(col, query, rows)
+            if rows is not None and not len(rows):
+                return rows
+            mask = self.text_mask(col, lambda texts: texts.str.contains(query, case=False, regex=False), rows)
+        elif operator == "regex":
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", UserWarning)  # Match groups are fine here
+                mask = self.text_mask(col, lambda texts: texts.str.contains(query, case=False, regex=True), rows)
+        elif operator == "equals":
+            if self.is_numeric(col):
+                try:
+                    value = float(query)
+                except ValueError:
+                    return np.empty(0, dtype=np.intp)
+                order, values = self.sorted_index(col)
+                start = np.searchsorted(values, value, side="left")
+                stop = np.searchsorted(values, value, side="right")
+                return np.sort(order[start:stop])
+            groups = self.groups(col)
+            if groups is not None:
+                codes, _, lookup = groups
+                code = lookup.get(query)
+                return np.empty(0, dtype=np.intp) if code is None else np.flatnonzero(codes == code)
+            mask = self.texts(col).to_numpy() == query
+        elif operator == "between":
+            if not self.is_numeric(col):
+                raise ValueError("Range filters need a numeric column.")
+            low, _, high = query.partition("..")
+            order, values = self.sorted_index(col)
+            start = np.searchsorted(values, float(low), side="left") if low.strip() else 0
+            stop = np.searchsorted(values, float(high), side="right") if high.strip() else np.count_nonzero(~pd.isna(values))
+            return np.sort(order[start:stop])
+        else:
+            raise ValueError(f"Unknown filter operator: {operator}")
+        return np.flatnonzero(mask) if rows is None else rows[mask]
+
+    def rows(self, col, operator, query, checkpoint=None):
+        # col is a column position, or None to search every column. checkpoint
+        # is called before each column so a superseded search can stop.
+        candidates = None
+        if operator == "contains" and self._last is not None:
+            last_col, last_query, last_rows = self._last
+            if last_col == col and last_query.lower() in query.lower():
+                candidates = last_rows  # Narrowing: only rows that matched before can match
+        columns = range(self._data.shape[1]) if col is None else [col]
+        if col is None and operator == "between":
+            columns = [c for c in columns if self.is_numeric(c)]
+        matched = np.zeros(self._data.shape[0], dtype=bool)
+        for c in columns:
+            if checkpoint is not None:
+                checkpoint()
+            matched[self.column_rows(c, operator, query, candidates)] = True
+        result = np.flatnonzero(matched)
+        if operator == "contains":
+            self._last = (col, query, result)
+        return result
+
+def moments(values):
+    # (count, mean, sum of squared deviations) of a float array, in two passes
+    # so a large common offset does not swamp the spread
+    if not len(values):
+        return 0, 0.0, 0.0
+    mean = float(values.mean())
+    deviations = values - mean
+    return len(values), mean, float(np.dot(deviations, deviations))
+
+def merge_moments(a, b):
+    # Chan et al.'s pairwise combination of two (count, mean, M2) triples
+    count = a[0] + b[0]
+    if not count:
+        return 0, 0.0, 0.0
+    delta = b[1] - a[1]
+    return count, a[1] + delta * b[0] / count, a[2] + b[2] + delta * delta * a[0] * b[0] / count
+
+def welford(stats, value, sign):
+    # Adds (sign 1) or removes (sign -1) one value from count, mean and m2
+    count = stats["count"] + sign
+    if count <= 0:
+        stats.update(count=0, mean=0.0, m2=0.0)
+        return
+    delta = value - stats["mean"]
+    mean = stats["mean"] + sign * delta / count
+    stats.update(count=count, mean=mean, m2=max(stats["m2"] + sign * delta * (value - mean), 0.0))
+
+def hll_distinct(values, precision=14):
+    # HyperLogLog estimate of the number of distinct values (~0.8% error at
+    # the default precision) in one vectorized pass over 64-bit hashes.
+    return hll_estimate(hll_registers(values, precision))
+
+def hll_registers(values, precision=14):
+    # Registers of several batches combine with np.maximum
+    m = 1 << precision
+    hashes = pd.util.hash_array(np.asarray(values))
+    buckets = (hashes >> np.uint64(64 - precision)).astype(np.intp)
+    rest = hashes << np.uint64(precision)
+    # Count leading zeros of the remaining bits by binary search
+    zeros = np.zeros(len(rest), dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        small = rest < (np.uint64(1) << np.uint64(64 - shift))
+        zeros[small] += shift
+        rest[small] <<= np.uint64(shift)
+    ranks = np.minimum(zeros, 64 - precision) + 1
+    registers = np.zeros(m, dtype=np.uint8)
+    np.maximum.at(registers, buckets, ranks.astype(np.uint8))
+    return registers
+
+def hll_estimate(registers):
+    m = len(registers)
+    estimate = 0.7213 / (1 + 1.079 / m) * m * m / np.sum(np.ldexp(1.0, -registers.astype(np.int64)))
+    empty = np.count_nonzero(registers == 0)
+    if estimate <= 2.5 * m and empty:
+        estimate = m * np.log(m / empty)  # Linear counting is better for small sets
+    return int(round(estimate))
+
+class ColumnStats:
+    # Per-column statistics for the Describe Data dialog. Columns are computed
+    # once, in parallel, and cached. Edits keep count, missing, mean, std (Welford),
+    # min and max current in O(1) and mark the column dirty so only its order
+    # statistics (quantiles, distinct, top) are recomputed. Above exact_rows,
+    # quantiles and the top value come from a sample and distinct counts from
+    # HyperLogLog.
+    exact_rows = 5000000
+    sample_rows = 1000000
+    rows = ["count", "missing", "mean", "std", "min", "25%", "50%", "75%", "max", "distinct", "top", "freq"]
+
+    def __init__(self, data, edits=None):
+        self._data = data
+        self.edits = EditOverlay() if edits is None else edits  # An empty overlay is falsy
+        self._stats = {}
+        self._dirty = set(range(data.shape[1]))
+        self._versions = [0] * data.shape[1]
+
+    def dirty_columns(self):
+        return sorted(self._dirty)
+
+    def version(self, col):
+        return self._versions[col]
+
+    def is_numeric(self, col):
+        return self._data.dtypes.iloc[col].kind in "iuf"
+
+    def compute(self, col, edits=None):
+        # Reads the column only, so several columns can run on worker threads.
+        # Those pass a snapshot of the edits, as the GUI thread keeps editing.
+        series = (self.edits if edits is None else edits).column(self._data, col)
+        approx = len(series) > self.exact_rows
+        rng = np.random.default_rng(col)
+        stats = {"approx": approx}
+        if self.is_numeric(col):
+            # Text typed into a numeric column counts as missing
+            values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+            valid = values[~np.isnan(values)]
+            stats.update(zip(["count", "mean", "m2"], moments(valid)), missing=len(values) - len(valid))
+            if len(valid):
+                stats.update(min=float(valid.min()), max=float(valid.max()))
+                sample = rng.choice(valid, self.sample_rows) if approx else valid
+                stats.update(zip(["25%", "50%", "75%"], np.quantile(sample, [0.25, 0.5, 0.75]).tolist()))
+            stats["distinct"] = hll_distinct(valid) if approx else len(np.unique(valid))
+        else:
+            missing = int(series.isna().sum())
+            stats.update(count=len(series) - missing, missing=missing)
+            valid = series.dropna()
+            sample = valid.sample(self.sample_rows, random_state=col) if approx and len(valid) > self.sample_rows else valid
+            counts = sample.value_counts()
+            if len(counts):
+                stats.update(top=counts.index[0], freq=int(counts.iloc[0]))
+            stats["distinct"] = hll_distinct(valid.to_numpy(dtype=object)) if approx else int(valid.nunique())
+        return stats
+
+    def store(self, col, stats, version):
+        if version != self._versions[col]:
+            return  # Edited while computing; stays dirty
+        self._stats[col] = stats
+        self._dirty.discard(col)
+
+    def invalidate(self, col):
+        self._versions[col] += 1
+        self._dirty.add(col)
+
+    def update(self, col, old, new):
+        # Called after a cell edit with the cell's old and new value
+        self.invalidate(col)
+        stats = self._stats.get(col)
+        if stats is None:
+            return
+        if not self.is_numeric(col) or "m2" not in stats:
+            for value, sign in ((old, -1), (new, 1)):
+                missing = pd.isna(value)
+                stats["missing" if missing else "count"] += sign
+            return
+        old, new = (pd.to_numeric(value, errors="coerce") for value in (old, new))
+        for value, sign in ((old, -1), (new, 1)):
+            if pd.isna(value):
+                stats["missing"] += sign
+            else:
+                welford(stats, float(value), sign)
+        if not pd.isna(new):
+            stats["min"] = min(stats.get("min", float(new)), float(new))
+            stats["max"] = max(stats.get("max", float(new)), float(new))
+
+    def extend(self, data):
+        # data is this frame with rows appended. Counts and moments take in
+        # just the new rows; every column is left dirty for its order stats.
+        first = self._data.shape[0]
+        self._data = data
+        for col, stats in self._stats.items():
+            series = data.iloc[first:, col]
+            if "m2" in stats:
+                values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+                valid = values[~np.isnan(values)]
+                merged = merge_moments((stats["count"], stats.get("mean", 0.0), stats["m2"]), moments(valid))
+                stats.update(zip(["count", "mean", "m2"], merged), missing=stats["missing"] + len(values) - len(valid))
+                if len(valid):
+                    stats["min"] = min(stats.get("min", np.inf), float(valid.min()))
+                    stats["max"] = max(stats.get("max", -np.inf), float(valid.max()))
+            else:
+                missing = int(series.isna().sum())
+                stats.update(count=stats["count"] + len(series) - missing, missing=stats["missing"] + missing)
+        for col in range(data.shape[1]):
+            self.invalidate(col)
+
+    def table(self):
+        return stats_table(self._data.columns, self._stats, self._dirty)
+
+def stats_table(columns, stats_by_col, dirty=()):
+    # Rows of stats by column, the layout DataFrame.describe uses
+    table = {}
+    for col in range(len(columns)):
+        stats = dict(stats_by_col.get(col, {}))
+        count = stats.get("count", 0)
+        if "m2" in stats:
+            if not count:
+                stats.pop("mean", None)
+            elif count > 1:
+                stats["std"] = (stats["m2"] / (count - 1)) ** 0.5
+        if stats.get("approx") and "distinct" in stats:
+            stats["distinct"] = f"~{stats['distinct']}"
+        table[col] = [stats.get(row, "") for row in ColumnStats.rows]
+    frame = pd.DataFrame(table, index=ColumnStats.rows, dtype=object)
+    frame.columns = [str(column) + (" *" if col in dirty else "") for col, column in enumerate(columns)]
+    return frame
+
+class StreamingStats:
+    # Describe for input read a chunk at a time, in memory bounded by the
+    # number of columns rather than rows. Each chunk's count, mean and M2 are
+    # merged in as it arrives, quantiles and the top value come from a bottom-k
+    # random sample once a column outgrows sample_rows, and distinct counts
+    # switch from exact value counts to HyperLogLog after exact_values distinct
+    # values.
+    def __init__(self, sample_rows=100000, exact_values=100000, seed=0):
+        self.sample_rows = sample_rows
+        self.exact_values = exact_values
+        self.rng = np.random.default_rng(seed)
+        self.columns = None
+        self.numeric = []
+        self.state = []
+
+    def add(self, chunk):
+        if self.columns is None:
+            self.columns = list(chunk.columns)
+            self.numeric = [kind in "iuf" for kind in (dtype.kind for dtype in chunk.dtypes)]
+            self.state = [{"count": 0, "missing": 0, "counts": pd.Series(dtype=np.int64),
+                           "registers": None, "priority": np.empty(0), "sample": None}
+                          for _ in self.columns]
+        for col, state in enumerate(self.state):
+            series = chunk.iloc[:, col]
+            if self.numeric[col]:
+                # Text in a numeric column counts as missing, as in ColumnStats
+                values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64)
+                valid = values[~np.isnan(values)]
+                state["moments"] = merge_moments(state.get("moments", (0, 0.0, 0.0)), moments(valid))
+                if len(valid):
+                    state["min"] = min(state.get("min", np.inf), float(valid.min()))
+                    state["max"] = max(state.get("max", -np.inf), float(valid.max()))
+            else:
+                # Chunks are typed separately, so text columns compare as strings
+                valid = series.dropna().astype(str).to_numpy(dtype=object)
+            state["count"] += len(valid)
+            state["missing"] += len(series) - len(valid)
+            if not len(valid):
+                continue
+            registers = hll_registers(valid)
+            state["registers"] = registers if state["registers"] is None else np.maximum(state["registers"], registers)
+            if state["counts"] is not None:
+                counts = state["counts"].add(pd.Series(valid).value_counts(), fill_value=0)
+                state["counts"] = counts if len(counts) <= self.exact_values else None
+            self.sample(state, valid)
+
+    def sample(self, state, values):
+        # Bottom-k by random priority is a uniform sample of everything seen
+        priority = np.concatenate([state["priority"], self.rng.random(len(values))])
+        sample = values if state["sample"] is None else np.concatenate([state["sample"], values])
+        if len(sample) > self.sample_rows:
+            keep = np.argpartition(priority, self.sample_rows)[:self.sample_rows]
+            priority, sample = priority[keep], sample[keep]
+        state["priority"], state["sample"] = priority, sample
+
+    def result(self, col):
+        state = self.state[col]
+        counts = state["counts"]
+        stats = {"approx": counts is None}
+        stats.update((name, state[name]) for name in ("count", "missing", "min", "max") if name in state)
+        if "moments" in state:
+            _, stats["mean"], stats["m2"] = state["moments"]
+        if state["sample"] is None:
+            stats["distinct"] = 0
+            return stats
+        stats["distinct"] = len(counts) if counts is not None else hll_estimate(state["registers"])
+        if self.numeric[col]:
+            stats.update(zip(["25%", "50%", "75%"], np.quantile(state["sample"], [0.25, 0.5, 0.75]).tolist()))
+        else:
+            top = counts if counts is not None else pd.Series(state["sample"]).value_counts()
+            top = top.sort_values(ascending=False, kind="stable")
+            stats.update(top=top.index[0], freq=int(top.iloc[0]))
+        return stats
+
+    def table(self):
+        columns = self.columns or []
+        return stats_table(columns, {col: self.result(col) for col in range(len(columns))})
+
+class CSVLoader:
+    # Reads a CSV file, or stdin for "-", as one frame or as a stream of
+    # (chunk, bytes read) pairs. The dialect is sniffed (or recalled) on first
+    # use and compressed input is decompressed as it streams. Plain files above
+    # parallel_threshold are split into byte ranges parsed in a process pool.
+    # checkpoint is called between chunks so the caller can stop a load by
+    # raising from it. dtype=str reads every value as written, for comparing.
+    first_chunk_rows = 1000  # Small first batch so the first screen shows right away
+    chunk_rows = 100000
+    parallel_threshold = 128 * 1024 * 1024  # Files above this are parsed on all cores
+    first_chunk_bytes = 1024 * 1024
+    range_bytes = 32 * 1024 * 1024
+    sample_rows = 10000  # Rows read up front to pick compact dtypes
+
+    def __init__(self, file_path, workers=None, cache=None, compact=False, checkpoint=None, dialect=None, dtype=None):
+        self.file_path = file_path
+        self.workers = workers or os.cpu_count() or 1
+        self.cache = cache
+        self.compact = compact
+        self.checkpoint = checkpoint or (lambda: None)
+        self.dialect = dialect
+        self.dtype = dtype
+
+    def sniff(self):
+        if self.dialect is None:
+            self.dialect = dialect_for(self.file_path)
+        return self.dialect
+
+    def read_args(self):
+        args = self.sniff().read_args()
+        if self.dtype is not None:
+            args["dtype"] = self.dtype
+        return args
+
+    def is_stdin(self):
+        return self.file_path == "-"
+
+    def size(self):
+        return 0 if self.is_stdin() else os.path.getsize(self.file_path)
+
+    def caching(self):
+        return self.cache is not None and not self.is_stdin() and self.cache.wants(self.file_path)
+
+    def load_cached(self):
+        if not self.caching():
+            return None
+        with tracer.span("cache load"):
+            return self.cache.load(self.file_path, "compact" if self.compact else "")
+
+    def store_cached(self, data):
+        if self.caching():
+            with tracer.span("cache store"):
+                self.cache.store(self.file_path, data, "compact" if self.compact else "")
+
+    def use_parallel(self):
+        return (self.workers > 1 and not self.is_stdin() and self.sniff().byte_records() and
+                self.size() >= self.parallel_threshold)
+
+    def read(self):
+        # The whole file as one frame, bypassing the cache
+        self.sniff()
+        if self.use_parallel():
+            return concat_frames(chunk for chunk, _ in self.parallel_chunks())
+        if self.is_stdin() or self.dialect.compression:
+            return concat_frames(chunk for chunk, _ in self.read_chunks())
+        if self.compact:
+            with tracer.span("parse", compact=True):
+                return read_csv_compact(self.file_path, self.sample_rows, **self.read_args())
+        with tracer.span("parse"):
+            return pd.read_csv(self.file_path, **self.read_args())
+
+    def head(self, rows):
+        with open_input(self.file_path, self.sniff().compression) as (stream, _):
+            return pd.read_csv(stream, nrows=rows, **self.read_args())
+
+    def chunks(self):
+        return self.parallel_chunks() if self.use_parallel() else self.read_chunks()
+
+    def read_chunks(self):
+        args = self.read_args()
+        if self.compact and not self.is_stdin():
+            args["dtype"] = infer_text_dtypes(self.head(self.sample_rows))
+        with open_input(self.file_path, self.dialect.compression) as (stream, raw):
+            reader = pd.read_csv(stream, iterator=True, **args)
+            rows = self.first_chunk_rows
+            position = 0
+            while True:
+                try:
+                    with tracer.span("parse chunk", rows=rows):
+                        chunk = reader.get_chunk(rows)
+                except StopIteration:
+                    break
+                self.checkpoint()
+                if not self.is_stdin():
+                    position = raw.tell()
+                yield compact_frame(chunk) if self.compact else chunk, position
+                rows = self.chunk_rows
+
+    def parallel_chunks(self):
+        # Splits the file into byte ranges on record boundaries and parses them
+        # in a process pool. The small first range is parsed here with the
+        # header; its dtypes become the schema every other range is read with.
+        size = self.size()
+        args = self.sniff().read_args()  # The ranges are read with dtypes instead
+        targets = [0, self.first_chunk_bytes] + list(range(self.range_bytes, size, self.range_bytes))
+        bounds = sorted(set(split_records(self.file_path, targets, self.dialect.quote_byte()) + [size]))
+        with open(self.file_path, "rb") as handle:
+            head = handle.read(bounds[1])
+        sample = pd.read_csv(io.BytesIO(head), **self.read_args())
+        columns = list(sample.columns)
+        dtypes = {col: dtype for col, dtype in sample.dtypes.items() if dtype.kind not in "iub"}
+        if self.compact:
+            dtypes.update(infer_text_dtypes(sample))
+            sample = compact_frame(pd.read_csv(io.BytesIO(head), dtype=dtypes, **args))
+        yield sample, bounds[1]
+        ranges = list(zip(bounds[1:], bounds[2:]))
+        if not ranges:
+            return
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # spawn, not fork: this may run on a worker thread of a Qt process
+        executor = ProcessPoolExecutor(min(self.workers, len(ranges)),
+                                       mp_context=multiprocessing.get_context("spawn"))
+        try:
+            # Ranges are submitted a few ahead of the one being consumed, so a
+            # slow consumer does not hold every parsed range in memory at once
+            ahead = 2 * self.workers
+            futures = deque()
+            for start, stop in ranges:
+                futures.append((executor.submit(parse_byte_range, self.file_path, start, stop, columns, dtypes,
+                                                self.compact, args), start, stop))
+                if len(futures) > ahead:
+                    yield self.wait_range(*futures.popleft())
+            while futures:
+                yield self.wait_range(*futures.popleft())
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def wait_range(self, future, start, stop):
+        self.checkpoint()
+        with tracer.span("parse range (wait)", start=start, stop=stop):
+            return future.result(), stop
+
+def frame_bytes(frame):
+    return int(frame.memory_usage(index=False, deep=True).sum())
+
+def write_run(blocks, tmp_dir, block_rows):
+    # Spills sorted frames to disk as a sequence of pickled blocks
+    handle = tempfile.NamedTemporaryFile("wb", dir=tmp_dir, prefix="merry-run-", suffix=".tmp", delete=False)
+    with handle:
+        for frame in blocks:
+            for start in range(0, len(frame), block_rows):
+                pickle.dump(frame.iloc[start:start + block_rows], handle, pickle.HIGHEST_PROTOCOL)
+    return handle.name
+
+def read_run(path):
+    with open(path, "rb") as handle:
+        while True:
+            try:
+                yield pickle.load(handle)
+            except EOFError:
+                return
+
+def merge_runs(runs, keys, checkpoint=None):
+    # Merges iterators of sorted blocks whose last column is a unique row id.
+    # The blocks in memory are sorted together and output up to the first row
+    # that ends a loaded block: every row still to come from that block's run
+    # sorts after it. Then that run's next block is loaded.
+    blocks = [next(run, None) for run in runs]
+    live = {number for number, block in enumerate(blocks) if block is not None}
+    if not live:
+        return
+    pending = pd.concat([block for block in blocks if block is not None], ignore_index=True)
+    keys = keys + [(pending.shape[1] - 1, True)]
+    while len(pending):
+        if checkpoint is not None:
+            checkpoint()
+        pending = pending.take(sort_permutation(pending, keys)).reset_index(drop=True)
+        if not live:
+            yield pending
+            return
+        ends = [(number, blocks[number].iat[-1, -1]) for number in live]
+        found = pd.Index(pending.iloc[:, -1]).get_indexer([end for _, end in ends])
+        stop, number = min(zip(found, [number for number, _ in ends]))
+        yield pending.iloc[:stop + 1]
+        pending = pending.iloc[stop + 1:]
+        block = next(runs[number], None)
+        if block is None:
+            live.discard(number)
+        else:
+            blocks[number] = block
+            pending = pd.concat([pending, block], ignore_index=True)
+
+def external_sort(chunks, keys, memory_bytes=256 * 1024 ** 2, tmp_dir=None, fan_in=16, chunk_rows=100000,
+                  checkpoint=None):
+    # Yields the rows of chunks ordered by keys, a list of (column position,
+    # ascending), stable like sort_permutation. Input is collected into runs of
+    # about memory_bytes; input that fits in one run is sorted in memory,
+    # otherwise runs are sorted, spilled to tmp_dir and merged fan_in at a time.
+    directory = tempfile.mkdtemp(prefix="merry-sort-", dir=tmp_dir)
+    run, run_bytes, paths, rows, block_rows = [], 0, [], 0, None
+    try:
+        def sort_run():
+            frame = pd.concat(run, ignore_index=True)
+            return frame.take(sort_permutation(frame, keys + [(frame.shape[1] - 1, True)]))
+
+        for chunk in chunks:
+            if checkpoint is not None:
+                checkpoint()
+            chunk = chunk.reset_index(drop=True)
+            # A row id column makes every row distinct, so runs merge stably
+            chunk.insert(chunk.shape[1], "\0row", np.arange(rows, rows + len(chunk)), allow_duplicates=True)
+            rows += len(chunk)
+            run.append(chunk)
+            run_bytes += frame_bytes(chunk)
+            if run_bytes >= memory_bytes:
+                with tracer.span("sort run", rows=sum(map(len, run))):
+                    frame = sort_run()
+                # Blocks sized so fan_in of them, one per run, fit the budget
+                block_rows = block_rows or max(1, len(frame) // fan_in)
+                paths.append(write_run([frame], directory, block_rows))
+                run, run_bytes = [], 0
+        if not paths:
+            frame = sort_run().iloc[:, :-1] if run else pd.DataFrame()
+            for start in range(0, max(len(frame), 1), chunk_rows):
+                yield frame.iloc[start:start + chunk_rows]
+            return
+        if run:
+            paths.append(write_run([sort_run()], directory, block_rows))
+        # Merge in passes until one pass can take every run at once
+        while len(paths) > fan_in:
+            merged = []
+            for start in range(0, len(paths), fan_in):
+                group = paths[start:start + fan_in]
+                with tracer.span("merge pass", runs=len(group)):
+                    merged.append(write_run(merge_runs([read_run(path) for path in group], keys, checkpoint),
+                                            directory, block_rows))
+                for path in group:
+                    os.remove(path)
+            paths = merged
+        for block in merge_runs([read_run(path) for path in paths], keys, checkpoint):
+            yield block.iloc[:, :-1]
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+AGGREGATIONS = ("count", "sum", "mean", "min", "max")
+
+class GroupAggregator:
+    # Hash aggregation a chunk at a time. Each chunk is grouped on its own
+    # (pandas hashes the keys, nothing is sorted) and its per-group rows and
+    # each value's count, sum, min and max are folded into running partials,
+    # so memory follows the number of groups rather than rows. count is rows
+    # per group; the other aggregations skip values that are not numbers.
+    max_pivot_columns = 1000
+
+    def __init__(self, keys, values=(), aggregations=("count",), pivot=None):
+        # keys, values and pivot are column positions
+        self.keys = list(keys)
+        self.values = list(values)
+        self.aggregations = [name for name in AGGREGATIONS if name in aggregations] or ["count"]
+        self.pivot = pivot
+        self.names = None
+        self.partial = None
+
+    def add(self, chunk):
+        if self.names is None:
+            self.names = list(chunk.columns)
+        by = self.keys + ([] if self.pivot is None else [self.pivot])
+        frame = pd.DataFrame({f"k{level}": chunk.iloc[:, position].reset_index(drop=True)
+                              for level, position in enumerate(by)})
+        for number, position in enumerate(self.values):
+            frame[f"v{number}"] = pd.to_numeric(chunk.iloc[:, position], errors="coerce").reset_index(drop=True)
+        groups = frame.groupby(list(frame.columns[:len(by)]), sort=False, dropna=False, observed=True)
+        part = pd.DataFrame({"rows": groups.size()})
+        for number in range(len(self.values)):
+            column = groups[f"v{number}"]
+            part[f"v{number} count"] = column.count()
+            part[f"v{number} sum"] = column.sum()
+            part[f"v{number} min"] = column.min()
+            part[f"v{number} max"] = column.max()
+        self.partial = part if self.partial is None else self.fold(pd.concat([self.partial, part]))
+
+    def fold(self, frame):
+        how = {column: column.rsplit(" ", 1)[-1] if column.endswith((" min", " max")) else "sum"
+               for column in frame.columns}
+        return frame.groupby(level=list(range(frame.index.nlevels)), sort=False, dropna=False).agg(how)
+
+    def result(self):
+        names = self.names or []
+        by = self.keys + ([] if self.pivot is None else [self.pivot])
+        if self.partial is None:
+            return pd.DataFrame(columns=[str(names[position]) for position in self.keys] + ["count"] if names else [])
+        part = self.partial
+        out = pd.DataFrame(index=part.index)
+        if "count" in self.aggregations or not self.values:
+            out["count"] = part["rows"]
+        for number, position in enumerate(self.values):
+            for name in self.aggregations:
+                if name == "count":
+                    continue
+                total = part[f"v{number} sum"] if name == "mean" else part[f"v{number} {name}"]
+                out[f"{name}({names[position]})"] = total / part[f"v{number} count"] if name == "mean" else total
+        out.index.names = [str(names[position]) for position in by]
+        try:
+            out = out.sort_index(na_position="last")
+        except TypeError:
+            pass  # Keys of mixed types stay in first-seen order
+        if self.pivot is not None:
+            pivots = out.index.get_level_values(-1).nunique(dropna=False)
+            if pivots > self.max_pivot_columns:
+                raise ValueError(f"{names[self.pivot]} has {pivots} distinct values; "
+                                 f"pivots are limited to {self.max_pivot_columns} columns.")
+            measures = list(out.columns)
+            out = out.unstack(-1)
+            out.columns = [str(pivot) if len(measures) == 1 else f"{measure} {pivot}" for measure, pivot in out.columns]
+        return out.reset_index()
+
+class CSVDiff:
+    # Compares two CSV files, matching rows on key columns. Both files are
+    # streamed once with each row's key hash and full-row hash; rows are
+    # spread over partitions by key hash, buffered and spilled to disk when
+    # the buffers pass memory_bytes, and the partitions are then compared one
+    # at a time, so memory follows one partition rather than the files.
+    # Values are compared as text, as they are written in the files. Rows
+    # with a repeated key are matched in file order.
+    max_partitions = 256
+
+    def __init__(self, old_path, new_path, keys, memory_bytes=256 * 1024 ** 2, tmp_dir=None, checkpoint=None,
+                 progress=None):
+        self.paths = {"old": old_path, "new": new_path}
+        self.keys = list(keys)  # Column names
+        self.memory_bytes = memory_bytes
+        self.tmp_dir = tmp_dir
+        self.checkpoint = checkpoint or (lambda: None)
+        self.progress = progress
+        self.summary = {"old rows": 0, "new rows": 0, "removed": 0, "added": 0, "changed": 0, "unchanged": 0,
+                        "repeated keys": 0}
+        headers = {side: [str(column) for column in CSVLoader(path, dtype=str).head(0).columns]
+                   for side, path in self.paths.items()}
+        self.columns = [column for column in headers["new"] if column in headers["old"]]
+        self.summary["only in old"] = [column for column in headers["old"] if column not in self.columns]
+        self.summary["only in new"] = [column for column in headers["new"] if column not in headers["old"]]
+        for key in self.keys:
+            if key not in self.columns:
+                raise ValueError(f"Key column {key!r} is not in both files.")
+
+    def differences(self):
+        # Yields frames of change ("removed", "added" or "changed"), line (the
+        # data row number in the file the row comes from) and the shared
+        # columns; changed cells read "old → new". The first frame is empty,
+        # so the columns are known even when the files match.
+        yield pd.DataFrame(columns=["change", "line"] + self.columns)
+        sizes = {side: os.path.getsize(path) for side, path in self.paths.items()}
+        # Parsed text takes a few times its size on disk
+        partitions = int(min(self.max_partitions, max(1, sum(sizes.values()) * 4 // self.memory_bytes + 1)))
+        directory = tempfile.mkdtemp(prefix="merry-diff-", dir=self.tmp_dir)
+        buffers = {(side, number): [] for side in self.paths for number in range(partitions)}
+        buffered = 0
+        try:
+            done = 0
+            for side, path in self.paths.items():
+                line = 0
+                for chunk, position in CSVLoader(path, checkpoint=self.checkpoint, dtype=str).chunks():
+                    chunk.columns = [str(column) for column in chunk.columns]
+                    chunk = chunk.loc[:, self.columns].reset_index(drop=True)
+                    chunk["\0key"] = pd.util.hash_pandas_object(chunk[self.keys], index=False).to_numpy()
+                    chunk["\0row"] = pd.util.hash_pandas_object(chunk[self.columns], index=False).to_numpy()
+                    chunk["\0line"] = np.arange(line + 1, line + len(chunk) + 1)
+                    line += len(chunk)
+                    for number, piece in chunk.groupby(chunk["\0key"].to_numpy() % np.uint64(partitions), sort=False):
+                        buffers[side, int(number)].append(piece)
+                    buffered += frame_bytes(chunk)
+                    if buffered > self.memory_bytes // 2 and partitions > 1:
+                        self.spill(buffers, directory)
+                        buffered = 0
+                    if self.progress is not None:
+                        self.progress((done + position) * 800 // max(sum(sizes.values()), 1))
+                self.summary[f"{side} rows"] = line
+                done += sizes[side]
+            for number in range(partitions):
+                self.checkpoint()
+                old, new = (self.partition(buffers, directory, side, number) for side in self.paths)
+                yield self.compare(old, new)
+                if self.progress is not None:
+                    self.progress(800 + (number + 1) * 200 // partitions)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    def spill(self, buffers, directory):
+        for (side, number), pieces in buffers.items():
+            if pieces:
+                with open(os.path.join(directory, f"{side}-{number}.pkl"), "ab") as handle:
+                    pickle.dump(pd.concat(pieces, ignore_index=True), handle, pickle.HIGHEST_PROTOCOL)
+                pieces.clear()
+
+    def partition(self, buffers, directory, side, number):
+        path = os.path.join(directory, f"{side}-{number}.pkl")
+        pieces = list(read_run(path)) if os.path.exists(path) else []
+        pieces += buffers.pop((side, number))
+        if not pieces:
+            return pd.DataFrame(columns=self.columns + ["\0key", "\0row", "\0line"])
+        frame = pd.concat(pieces, ignore_index=True)
+        # The n-th row with a key matches the n-th row with it in the other file
+        frame["\0seen"] = frame.groupby("\0key", sort=False).cumcount()
+        self.summary["repeated keys"] += int((frame["\0seen"] > 0).sum())
+        return frame
+
+    def compare(self, old, new):
+        # Key hashes stand in for the keys: 64-bit hashes do not collide at
+        # any realistic row count
+        pairs = old[["\0key", "\0seen", "\0row"]].reset_index().merge(
+            new[["\0key", "\0seen", "\0row"]].reset_index(), on=["\0key", "\0seen"], how="outer",
+            suffixes=(" old", " new"))
+        removed = pairs["index new"].isna().to_numpy()
+        added = pairs["index old"].isna().to_numpy()
+        changed = ~removed & ~added & (pairs["\0row old"] != pairs["\0row new"]).to_numpy()
+        self.summary["removed"] += int(removed.sum())
+        self.summary["added"] += int(added.sum())
+        self.summary["changed"] += int(changed.sum())
+        self.summary["unchanged"] += int((~removed & ~added & ~changed).sum())
+        frames = []
+        for change, rows, side in (("removed", removed, old), ("added", added, new)):
+            picked = side.take(pairs.loc[rows, f"index {'old' if side is old else 'new'}"].astype(np.int64).to_numpy())
+            frames.append(picked.assign(change=change))
+        before = old.take(pairs.loc[changed, "index old"].astype(np.int64).to_numpy()).reset_index(drop=True)
+        after = new.take(pairs.loc[changed, "index new"].astype(np.int64).to_numpy()).reset_index(drop=True)
+        marked = after.copy()
+        for column in self.columns:
+            differs = ~((before[column] == after[column]) | (before[column].isna() & after[column].isna()))
+            if differs.any():
+                marked[column] = marked[column].astype(object)
+                marked.loc[differs, column] = (before.loc[differs, column].fillna("").astype(str) + " → " +
+                                               after.loc[differs, column].fillna("").astype(str))
+        frames.append(marked.assign(change="changed"))
+        result = pd.concat(frames, ignore_index=True).sort_values("\0line", kind="stable")
+        result = result.rename(columns={"\0line": "line"})
+        return result[["change", "line"] + self.columns].reset_index(drop=True)
+
+COMMANDS = ("head", "stats", "sort", "convert", "group", "diff")
+
+def column_positions(columns, names, parser):
+    # Headerless files have numbered columns, named 0, 1, ... here
+    columns = [str(column) for column in columns]
+    positions = []
+    for name in names:
+        if name not in columns:
+            parser.error(f"no column named {name!r}; columns are {', '.join(columns)}")
+        positions.append(columns.index(name))
+    return positions
+
+def sort_keys(columns, specs, parser):
+    # NAME or NAME:desc, in priority order
+    keys = []
+    for spec in specs:
+        name, _, direction = spec.rpartition(":") if spec.endswith((":asc", ":desc")) else (spec, "", "asc")
+        keys.append((column_positions(columns, [name], parser)[0], direction == "asc"))
+    return keys
+
+def peek_chunks(chunks):
+    # The first chunk, to learn the columns, and an iterator over all of them
+    first = next(chunks, None)
+    if first is None:
+        return None, iter(())
+    return first, itertools.chain([first], chunks)
+
+def write_output(path, chunks, quoting=csv.QUOTE_MINIMAL, header=True):
+    if path == "-":
+        sys.stdout.reconfigure(newline="")
+        written = write_chunks(sys.stdout, chunks, quoting=quoting, header=header)
+        sys.stdout.flush()
+        return written
+    # Files are replaced atomically and compressed by extension, as saves are
+    return write_csv(path, chunks, 0, quoting, header=header)
+
+def run_command(args, parser):
+    if args.command == "diff":
+        diff = CSVDiff(args.old, args.new, args.key, int(args.memory_mb * 1024 ** 2), args.tmp_dir)
+        write_output(args.output, diff.differences())
+        summary = diff.summary
+        print(", ".join(f"{name}: {', '.join(value) if isinstance(value, list) else value}"
+                        for name, value in summary.items() if value or name in ("removed", "added", "changed")),
+              file=sys.stderr)
+        # Like diff(1): 1 when the files differ
+        return 1 if summary["removed"] or summary["added"] or summary["changed"] else 0
+    loader = CSVLoader(args.input)
+    if args.command == "head":
+        write_output(args.output, [loader.head(args.lines)], header=loader.dialect.header)
+        return 0
+    first, chunks = peek_chunks(chunk for chunk, _ in loader.chunks())
+    if first is None:
+        parser.error(f"{args.input} has no header row")
+    columns = list(first.columns)
+    if args.command == "stats":
+        stats = StreamingStats()
+        for chunk in chunks:
+            stats.add(chunk)
+        table = stats.table()
+        if args.format == "csv":
+            sys.stdout.reconfigure(newline="")
+            table.to_csv(sys.stdout)
+        elif args.format == "json":
+            json.dump({column: {row: (value.item() if hasattr(value, "item") else value)
+                                for row, value in table[column].items() if value != ""}
+                       for column in table.columns}, sys.stdout, indent=2, default=str)
+            sys.stdout.write("\n")
+        else:
+            sys.stdout.write(table.to_string() + "\n")
+        sys.stdout.flush()
+        return 0
+    if args.command == "group":
+        pivot = column_positions(columns, [args.pivot], parser)[0] if args.pivot else None
+        aggregator = GroupAggregator(column_positions(columns, args.by, parser),
+                                     column_positions(columns, args.value or [], parser), args.agg or ["count"], pivot)
+        for chunk in chunks:
+            aggregator.add(chunk)
+        write_output(args.output, [aggregator.result()])
+        return 0
+    if args.command == "sort":
+        keys = sort_keys(columns, args.by, parser)
+        chunks = external_sort(chunks, keys, int(args.memory_mb * 1024 ** 2), args.tmp_dir)
+    if args.command == "convert" and args.columns:
+        positions = column_positions(columns, args.columns.split(","), parser)
+        chunks = (chunk.iloc[:, positions] for chunk in chunks)
+    write_output(args.output, chunks, csv.QUOTE_ALL if getattr(args, "quote_all", False) else csv.QUOTE_MINIMAL,
+                 loader.dialect.header)
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="merry", description="Work with CSV files without opening the viewer. "
+                                     "INPUT and OUTPUT may be - for stdin and stdout. INPUT's delimiter, quoting, "
+                                     "header, encoding and compression (gzip, bz2, xz, zstd) are detected.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    head = commands.add_parser("head", help="print the first rows")
+    head.add_argument("-n", "--lines", type=int, default=10)
+    stats = commands.add_parser("stats", help="describe every column, streaming the file once")
+    stats.add_argument("--format", choices=["text", "csv", "json"], default="text")
+    sort = commands.add_parser("sort", help="sort rows; files larger than memory are merge sorted on disk")
+    sort.add_argument("--by", action="append", required=True, metavar="NAME[:desc]",
+                      help="sort key; repeat for ties, first is most significant")
+    sort.add_argument("--memory-mb", type=float, default=256, help="memory for sorted runs (default 256)")
+    sort.add_argument("--tmp-dir", help="directory for sorted runs (default the system temporary directory)")
+    convert = commands.add_parser("convert", help="copy to another file, compressed by the output extension")
+    convert.add_argument("--quote-all", action="store_true", help="quote every field")
+    convert.add_argument("--columns", help="comma separated columns to keep, in this order")
+    group = commands.add_parser("group", help="count or aggregate rows per key, optionally pivoted")
+    group.add_argument("--by", action="append", required=True, metavar="NAME", help="group key; repeat for more")
+    group.add_argument("--value", action="append", metavar="NAME", help="column to aggregate; repeat for more")
+    group.add_argument("--agg", action="append", choices=AGGREGATIONS, help="aggregation; repeat for more (default count)")
+    group.add_argument("--pivot", metavar="NAME", help="spread this column's values across the result columns")
+    for command in (head, stats, sort, convert, group):
+        command.add_argument("input", metavar="INPUT")
+        if command is not stats:
+            command.add_argument("-o", "--output", default="-", metavar="OUTPUT")
+    diff = commands.add_parser("diff", help="rows removed, added or changed between two files, matched on keys; "
+                               "exits 1 when they differ")
+    diff.add_argument("--key", action="append", required=True, metavar="NAME", help="key column; repeat for more")
+    diff.add_argument("--memory-mb", type=float, default=256, help="memory for partitions (default 256)")
+    diff.add_argument("--tmp-dir", help="directory for spilled partitions (default the system temporary directory)")
+    diff.add_argument("old", metavar="OLD")
+    diff.add_argument("new", metavar="NEW")
+    diff.add_argument("-o", "--output", default="-", metavar="OUTPUT")
+    return parser
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    try:
+        return run_command(args, parser)
+    except BrokenPipeError:
+        # The reader went away (merry sort ... | head); stop quietly
+        devnull = os.open(os.devnull, os.O_WRONLY)
+        os.dup2(devnull, sys.stdout.fileno())
+        return 1
+    except (OSError, ValueError) as e:
+        print(f"merry {args.command}: {e}", file=sys.stderr)
+        return 2
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from merry_core import ColumnStats, EditOverlay, StreamingStats
+
+MOMENTS = ["count", "mean", "std", "min", "max"]
+
+def frame(rows=200000, seed=0):
+    # A large common offset is where sum-of-squares variance falls apart
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"offset": 1.7e9 + rng.normal(0, 1, rows),
+                         "small": rng.normal(5, 3, rows),
+                         "int": rng.integers(-1000, 1000, rows)})
+
+def check(table, data):
+    expected = data.describe()
+    for position, name in enumerate(data.columns):
+        for row in MOMENTS:
+            assert table.iloc[:, position][row] == pytest.approx(expected[name][row], rel=1e-9), (name, row)
+
+def column_stats(data, edits=None):
+    stats = ColumnStats(data, edits=edits)
+    for col in stats.dirty_columns():
+        stats.store(col, stats.compute(col), stats.version(col))
+    return stats
+
+def test_column_stats_matches_describe():
+    data = frame()
+    check(column_stats(data).table(), data)
+
+def test_streaming_stats_matches_describe():
+    data = frame()
+    stats = StreamingStats()
+    for start in range(0, len(data), 30000):
+        stats.add(data.iloc[start:start + 30000])
+    check(stats.table(), data)
+
+def test_edits_keep_moments_current():
+    data = frame(rows=1000)
+    edits = EditOverlay()
+    stats = column_stats(data, edits)
+    edited = data.copy()
+    for row, value in ((3, 1.7e9 + 10), (500, 1.7e9 - 4), (3, 1.7e9 + 2)):
+        old = edits.get(row, 0, data.iat[row, 0])
+        edits.set(row, 0, value)
+        stats.update(0, old, value)
+        edited.iat[row, 0] = value
+    table = stats.table()
+    expected = edited.describe()["offset"]
+    for row in ["count", "mean", "std"]:
+        assert table.iloc[:, 0][row] == pytest.approx(expected[row], rel=1e-9), row
+
+def test_appended_rows_keep_moments_current():
+    data = frame(rows=3000)
+    stats = column_stats(data.iloc[:2000].reset_index(drop=True))
+    stats.extend(data)
+    check(stats.table(), data)